@@ -1,8 +1,12 @@
+import itertools
+import uuid
 import streamlit as st
-import json
-import os
-import html
+from collections import Counter
+from datetime import datetime, timedelta
 import logic  # Refactored logic module
+import render
+from diagnostics import ScanDiagnostics
+from news_entry import NewsEntry
 
 # ================= 1. 頁面設定 (必須放第一行) =================
 st.set_page_config(
@@ -13,6 +17,12 @@ st.set_page_config(
 
 # ================= 2. 常數與 CSS 設定 =================
 
+# 高水位標記範圍前綴 (「只看新進新聞」以同一範圍內的上次執行為準；實際範圍見 watermark_scope)
+APP_WATERMARK_SCOPE = "app"
+
+# 歷史庫渲染快取頁數上限
+HISTORY_CACHE_PAGES = 200
+
 # CSS 美化樣式
 CUSTOM_CSS = """
 <style>
@@ -68,30 +78,175 @@ st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # ================= 3. UI 輔助函式 =================
 
+def watermark_scope():
+    """每位使用者各自的高水位標記：填了名稱時跨 session 沿用，否則只限本 session"""
+    name = st.session_state.get('reader_name', '').strip()
+    if name:
+        return f"{APP_WATERMARK_SCOPE}:user:{name}"
+    if 'session_scope' not in st.session_state:
+        st.session_state['session_scope'] = uuid.uuid4().hex
+    return f"{APP_WATERMARK_SCOPE}:session:{st.session_state['session_scope']}"
+
+def generate_with_progress(days_label, days_int, search_mode, custom_keyword=None):
+    """
+    logic.generate_chatgpt_prompt 的 Streamlit adapter：以 on_update 串流顯示暫定結果，
+    每個來源完成即更新，不需等待最慢的來源
+    同一次搜尋的 rerun (載入更多、切換分頁) 沿用本 session 上次的結果，
+    避免重複抓取，也避免高水位標記在 rerun 時被推進
+    """
+    delta = st.session_state.get('delta_mode', False)
+    scope = watermark_scope()
+    result_key = (search_mode, custom_keyword, days_int, delta, scope, st.session_state.get('run_id', 0))
+    cached = st.session_state.get('last_result')
+    if cached and cached[0] == result_key:
+        return cached[1], cached[2]
+    diagnostics = ScanDiagnostics()
+
+    # 讀取快照或共用其他 session 的結果時不會有串流更新，直接顯示最終結果
+    preview = st.empty()
+    preview.caption("📡 正在平行掃描來源...")
+
+    def _on_update(update):
+        with preview.container():
+            display_partial_results(update)
+
+    prompt, news_list = logic.generate_chatgpt_prompt(days_label, days_int, search_mode, custom_keyword,
+                                                      watermark_scope=scope, delta=delta,
+                                                      diagnostics=diagnostics, on_update=_on_update)
+    preview.empty()
+    st.session_state['last_result'] = (result_key, prompt, news_list, diagnostics)
+    return prompt, news_list
+
 def display_results(prompt, news_list):
     """顯示搜尋結果的共用函數"""
+    cached = st.session_state.get('last_result')
+    diagnostics = cached[3] if cached else None
+    if diagnostics and diagnostics.failures:
+        failed = "、".join(f"{s.name} ({s.error})" for s in diagnostics.failures)
+        st.warning(f"⚠️ {len(diagnostics.failures)} 個來源抓取失敗：{failed}")
+
     st.markdown("##### 1. AI 分析指令")
     with st.expander("點擊展開查看 Prompt", expanded=True):
         st.code(prompt, language="markdown")
         
     st.markdown("##### 2. 相關新聞速覽")
     if news_list:
-        for news in news_list:
-            cat = news.get('category', '一般')
-            # Security fix: Escape HTML special characters
-            safe_title = html.escape(news['title'])
-            safe_source = html.escape(news['source'])
-            
-            safe_link = news['link'] if news['link'].startswith(('http://', 'https://')) else '#'
-            st.markdown(f'''
-            <div class="news-card">
-                <a href="{safe_link}" target="_blank" class="news-title">{safe_title}</a>
-                <div class="news-meta">{news['date']} • {safe_source} <span class="news-tag">{cat}</span></div>
-            </div>
-            ''', unsafe_allow_html=True)
+        news_list = tag_filter(news_list, key="result_tags")
+        # 整批卡片合成單一 HTML 區塊，超過一頁時以「載入更多」延伸
+        shown = st.session_state.get('results_shown', render.PAGE_SIZE)
+        st.markdown(render.render_cards(news_list[:shown]), unsafe_allow_html=True)
+        if len(news_list) > shown:
+            st.button(f"⬇️ 載入更多 ({shown}/{len(news_list)})", on_click=_show_more_results)
     else:
         st.warning("查無新聞資料。")
 
+    if diagnostics:
+        display_diagnostics(diagnostics)
+
+def tag_filter(news_list, key):
+    """公司 / 主題標籤篩選 (選項附上則數，依則數排序)；未選擇時回傳原列表"""
+    counts = Counter(tag for news in news_list for tag in news.tags)
+    if not counts:
+        return news_list
+    # 換了一批結果後，移除已不存在的選項
+    if key in st.session_state:
+        st.session_state[key] = [t for t in st.session_state[key] if t in counts]
+    selected = st.multiselect("🏷️ 公司 / 主題", [t for t, _ in counts.most_common()], key=key,
+                              format_func=lambda t: f"{t} ({counts[t]})", placeholder="全部")
+    if not selected:
+        return news_list
+    wanted = set(selected)
+    return [news for news in news_list if wanted.intersection(news.tags)]
+
+def display_partial_results(update):
+    """串流中的暫定結果 (全部來源完成後由 display_results 的最終結果取代)"""
+    st.progress(update.done / update.total, text=f"📡 已完成 {update.done}/{update.total} 個來源，持續更新中...")
+    st.markdown("##### 1. AI 分析指令")
+    with st.expander("點擊展開查看 Prompt", expanded=True):
+        st.code(update.prompt, language="markdown")
+    st.markdown("##### 2. 相關新聞速覽")
+    if update.news_list:
+        st.markdown(render.render_cards(update.news_list[:render.PAGE_SIZE]), unsafe_allow_html=True)
+
+def display_diagnostics(diagnostics):
+    """每個來源的抓取耗時與狀態 (預設收合)，可匯出 JSON / Prometheus"""
+    with st.expander("🩺 抓取診斷", expanded=False):
+        if diagnostics.shared:
+            st.caption("本次結果與其他使用者同時段的查詢共用 (未重複抓取)，以下為該次抓取的量測。")
+        if diagnostics.from_snapshot:
+            st.caption("本次結果讀取自背景預抓快照，未即時抓取。")
+            return
+        st.caption(f"總耗時 {diagnostics.duration_ms / 1000:.1f} 秒 • {len(diagnostics.sources)} 個來源 • "
+                   f"失敗 {len(diagnostics.failures)} 個")
+        st.dataframe(diagnostics.to_rows(), hide_index=True)
+        d_json, d_prom = st.columns(2)
+        with d_json:
+            st.download_button("⬇️ JSON", diagnostics.to_json(), file_name="diagnostics.json",
+                               mime="application/json", use_container_width=True)
+        with d_prom:
+            st.download_button("⬇️ Prometheus", diagnostics.to_prometheus(), file_name="diagnostics.prom",
+                               mime="text/plain", use_container_width=True)
+
+def _show_more_results():
+    st.session_state['results_shown'] = st.session_state.get('results_shown', render.PAGE_SIZE) + render.PAGE_SIZE
+
+@st.cache_data(max_entries=HISTORY_CACHE_PAGES, show_spinner=False)
+def _history_page_html(query_key, data_version, page):
+    """
+    歷史庫單頁 HTML (以查詢條件 + 資料版本 + 頁碼為快取鍵)
+    :return: (html, 是否有下一頁)
+    """
+    query, categories, sources, tags, since, until = query_key
+    rows = logic.NEWS_STORE.search(query, categories=categories, sources=sources, since=since, until=until,
+                                   tags=tags, limit=render.PAGE_SIZE + 1, offset=page * render.PAGE_SIZE)
+    return render.render_cards(rows[:render.PAGE_SIZE], "歷史"), len(rows) > render.PAGE_SIZE
+
+@st.cache_data(max_entries=HISTORY_CACHE_PAGES, show_spinner=False)
+def _archive_page_html(month, archive_version, page):
+    """
+    封存單頁 HTML (只解壓到該頁為止；archive_version 為分割的 member 數，附加後即失效)
+    :return: (html, 是否有下一頁)
+    """
+    start = page * render.PAGE_SIZE
+    rows = [NewsEntry.from_dict(record) for record in
+            itertools.islice(logic.NEWS_STORE.archive.read(month), start, start + render.PAGE_SIZE + 1)]
+    return render.render_cards(rows[:render.PAGE_SIZE], "封存"), len(rows) > render.PAGE_SIZE
+
+def display_archive(archive):
+    """月份封存瀏覽 (資料庫只保留近期新聞時，較舊的在此查看)"""
+    months = archive.months()
+    if not months:
+        return
+    with st.expander(f"🗄️ 封存 (共 {archive.count()} 則 • {archive.size_bytes() / 1024 / 1024:.1f} MB)"):
+        month = st.selectbox("封存月份", months, key="archive_month",
+                             help="依寫入封存的月份分割，不是新聞發布月份；首次啟用封存時既有的歷史資料都在啟用當月")
+        if st.session_state.get('archive_view') != month:
+            st.session_state['archive_view'] = month
+            st.session_state['archive_page'] = 0
+        page = st.session_state['archive_page']
+        page_html, has_next = _archive_page_html(month, archive.stats(month)[1], page)
+        st.markdown(page_html, unsafe_allow_html=True)
+        a_prev, a_label, a_next = st.columns([1, 2, 1])
+        with a_prev:
+            if st.button("◀ 上一頁", key="archive_prev", disabled=page == 0, use_container_width=True):
+                st.session_state['archive_page'] = page - 1
+                st.rerun()
+        with a_label:
+            st.caption(f"{month} • 第 {page + 1} 頁")
+        with a_next:
+            if st.button("下一頁 ▶", key="archive_next", disabled=not has_next, use_container_width=True):
+                st.session_state['archive_page'] = page + 1
+                st.rerun()
+
+def _date_range_to_epoch(date_range):
+    """st.date_input 的 (起, 迄) 轉為 UTC epoch 區間 [since, until)；未選擇時為 None"""
+    if not date_range:
+        return None, None
+    start = datetime.combine(date_range[0], datetime.min.time()).timestamp()
+    end_date = date_range[1] if len(date_range) > 1 else date_range[0]
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()).timestamp()
+    return int(start), int(end)
+
 # ================= 4. 網頁主程式 =================
 
 st.markdown('<div class="big-font">Amy 的印尼研究院</div>', unsafe_allow_html=True)
@@ -115,6 +270,8 @@ with tab1:
         def set_search(mode, keyword=""):
             st.session_state['search_type'] = mode
             st.session_state['search_keyword'] = keyword
+            st.session_state['results_shown'] = render.PAGE_SIZE
+            st.session_state['run_id'] = st.session_state.get('run_id', 0) + 1
 
         # 1. 時間選擇
         st.caption("1. 時間範圍")
@@ -128,6 +285,10 @@ with tab1:
         if date_selection:
             st.session_state['days_int'] = logic.DATE_MAP[date_selection] 
 
+        st.toggle("🆕 只看新進新聞", key="delta_mode", help="只列出上次執行後新增的新聞")
+        st.text_input("名稱", key="reader_name", placeholder="留空則只記錄本次瀏覽",
+                      help="「只看新進新聞」以同名稱的上次執行為準，下次開啟頁面時填入同一名稱即可延續")
+
         # 2. 主題選擇
         st.caption("2. 分析主題")
         try:
@@ -186,22 +347,22 @@ with tab1:
         else:
             if s_type == "custom" and s_kw:
                 with st.spinner(f"正在全網搜索 {s_kw}..."):
-                    prompt, news_list = logic.generate_chatgpt_prompt(selected_label, days_int, "custom", s_kw)
+                    prompt, news_list = generate_with_progress(selected_label, days_int, "custom", s_kw)
                     display_results(prompt, news_list)
                     
             elif s_type == "macro":
                 with st.spinner("正在掃描印尼大選、經貿與台印新聞..."):
-                    prompt, news_list = logic.generate_chatgpt_prompt(selected_label, days_int, "macro")
+                    prompt, news_list = generate_with_progress(selected_label, days_int, "macro")
                     display_results(prompt, news_list)
                     
             elif s_type == "industry":
                 with st.spinner("正在掃描印尼EV與電子產業新聞..."):
-                    prompt, news_list = logic.generate_chatgpt_prompt(selected_label, days_int, "industry")
+                    prompt, news_list = generate_with_progress(selected_label, days_int, "industry")
                     display_results(prompt, news_list)
                     
             elif s_type == "vip":
                 with st.spinner("正在掃描重點台商動態..."):
-                    prompt, news_list = logic.generate_chatgpt_prompt(selected_label, days_int, "vip")
+                    prompt, news_list = generate_with_progress(selected_label, days_int, "vip")
                     display_results(prompt, news_list)
 
 with tab2:
@@ -211,33 +372,50 @@ with tab2:
     with col_head_2:
         if st.button("🔄 刷新列表"): st.rerun()
     
-    if os.path.exists('news_data.json'):
-        with open('news_data.json', 'r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                data = {}
-        
-        news_list = data.get('news_list', [])
-        st.caption(f"📅 上次更新: {data.get('timestamp', '未知')} (共 {len(news_list)} 則)")
-
-        search_query = st.text_input("🔍 搜尋歷史...", placeholder="請輸入標題關鍵字")
-        if search_query:
-            news_list = [n for n in news_list if search_query.lower() in n['title'].lower()]
-
-        if news_list:
-            for news in news_list:
-                cat = news.get('category', '歷史')
-                safe_title = html.escape(news['title'])
-                safe_source = html.escape(news['source'])
-                safe_link = news['link'] if news['link'].startswith(('http://', 'https://')) else '#'
-                st.markdown(f"""
-                <div class="news-card">
-                    <a href="{safe_link}" target="_blank" class="news-title">{safe_title}</a>
-                    <div class="news-meta">{news['date']} • {safe_source} <span class="news-tag">{cat}</span></div>
-                </div>
-                """, unsafe_allow_html=True)
+    store = logic.NEWS_STORE
+    total = store.count()
+    if total:
+        st.caption(f"📅 上次更新: {store.last_updated() or '未知'} (共 {total} 則)")
+
+        search_query = st.text_input("🔍 搜尋歷史...", placeholder='標題 / 來源 / 分類關鍵字 (空白=且、OR=或、"片語")')
+        f_cat, f_src, f_tag, f_date = st.columns(4)
+        with f_cat:
+            categories = st.multiselect("分類", store.facet_values("category"), placeholder="全部分類")
+        with f_src:
+            sources = st.multiselect("來源", store.facet_values("source"), placeholder="全部來源")
+        with f_tag:
+            tag_counts = dict(store.tag_counts())
+            tags = st.multiselect("🏷️ 公司 / 主題", list(tag_counts), placeholder="全部",
+                                  format_func=lambda t: f"{t} ({tag_counts[t]})")
+        with f_date:
+            date_range = st.date_input("日期範圍", value=(), format="YYYY-MM-DD")
+
+        since, until = _date_range_to_epoch(date_range)
+        query_key = (search_query, tuple(categories), tuple(sources), tuple(tags), since, until)
+        if st.session_state.get('history_query_key') != query_key:
+            st.session_state['history_query_key'] = query_key
+            st.session_state['history_page'] = 0
+        page = st.session_state['history_page']
+
+        page_html, has_next = _history_page_html(query_key, store.data_version(), page)
+        if page_html:
+            st.markdown(page_html, unsafe_allow_html=True)
+
+            p_prev, p_label, p_next = st.columns([1, 2, 1])
+            with p_prev:
+                if st.button("◀ 上一頁", disabled=page == 0, use_container_width=True):
+                    st.session_state['history_page'] = page - 1
+                    st.rerun()
+            with p_label:
+                st.caption(f"第 {page + 1} 頁")
+            with p_next:
+                if st.button("下一頁 ▶", disabled=not has_next, use_container_width=True):
+                    st.session_state['history_page'] = page + 1
+                    st.rerun()
         else:
             st.warning("無符合資料")
     else:
-        st.info("尚無歷史紀錄，請先在生成器執行搜尋。")
\ No newline at end of file
+        st.info("尚無歷史紀錄，請先在生成器執行搜尋。")
+
+    if store.archive:
+        display_archive(store.archive)
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+歷史新聞封存 (依月份分割的 gzip JSONL)
+
+- 每個月一個分割檔 YYYY-MM.jsonl.gz，只以附加方式寫入：每次寫入為一個獨立的 gzip member，
+  整檔仍可直接以 gzip / zcat 讀取
+- 旁邊的 YYYY-MM.idx.jsonl 為小型索引，每個 member 一行：位移、長度、筆數、發布時間範圍、連結雜湊
+- 寫入一律落在當月分割 (依封存時間，不是發布時間)，過去月份的檔案不再變動，讀取時以 mmap 開啟；
+  首次啟用封存時既有的歷史資料全部落在啟用當月
+- 附加時只比對當月分割的連結雜湊，不讀取過去月份；跨月份的重複由 NewsStore (link 唯一) 避免
+- 讀取時先以索引排除時間範圍不符的 member，只解壓需要的部分
+- 各分割的筆數 / member 數依索引檔的 mtime 與大小快取，未變動的分割不重新解析
+- 跨程序寫入以 fcntl.flock 互斥 (不支援的平台只有同程序內互斥)
+
+SQLite (storage.py) 為熱資料層；封存保留全部歷史，可搭配 NewsStore 的 retention_days 只在熱資料層保留近期新聞。
+"""
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ================= 1. Constants =================
+
+DEFAULT_ARCHIVE_DIR: str = "archive"
+DATA_SUFFIX: str = ".jsonl.gz"
+INDEX_SUFFIX: str = ".idx.jsonl"
+COMPRESS_LEVEL: int = 6
+
+# ================= 2. Helper Functions =================
+
+def month_of(ts: float) -> str:
+    """UTC epoch -> 分割名稱 (YYYY-MM)"""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m")
+
+def link_hash(link: str) -> str:
+    """索引中的連結以短雜湊儲存，維持索引檔小巧"""
+    return hashlib.sha1(link.encode("utf-8")).hexdigest()[:12]
+
+def _overlaps(block: Dict[str, Any], since: Optional[int], until: Optional[int]) -> bool:
+    """member 的發布時間範圍是否與 [since, until) 重疊；含無日期項目的 member 一律保留"""
+    if block.get("undated"):
+        return True
+    if block.get("min_ts") is None:
+        return False
+    if since is not None and block["max_ts"] < since:
+        return False
+    if until is not None and block["min_ts"] >= until:
+        return False
+    return True
+
+# ================= 3. Archive =================
+
+class Archive:
+    """
+    :param root: 封存目錄
+    """
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        # 月份 -> (索引檔 (mtime_ns, 大小), 該分割的連結雜湊)；只載入寫入中的當月
+        self._links: Dict[str, Tuple[Tuple[int, int], Set[str]]] = {}
+        # 月份 -> ((索引檔 mtime_ns, 大小), (筆數, member 數))
+        self._stats: Dict[str, Tuple[Tuple[int, int], Tuple[int, int]]] = {}
+
+    def _path(self, month: str, suffix: str) -> str:
+        return os.path.join(self.root, month + suffix)
+
+    # ---------- 寫入 ----------
+
+    def append(self, items: Iterable[Dict[str, Any]], now: Optional[float] = None) -> int:
+        """
+        將尚未封存的項目附加至當月分割 (單一 gzip member)
+        :param items: 需含 link；published_ts 為發布時間 (UTC epoch，可為 None)
+        :return: 實際寫入的筆數
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            month = month_of(now)
+            known = self._month_links(month)
+            records, hashes, batch = [], [], set()
+            for item in items:
+                h = link_hash(item["link"])
+                if h in known or h in batch:
+                    continue
+                batch.add(h)
+                records.append(item)
+                hashes.append(h)
+            if not records:
+                return 0
+
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+            member = gzip.compress(payload, compresslevel=COMPRESS_LEVEL, mtime=0)
+            stamps = [r["published_ts"] for r in records if r.get("published_ts") is not None]
+
+            os.makedirs(self.root, exist_ok=True)
+            with open(self._path(month, DATA_SUFFIX), "ab") as data:
+                if fcntl:
+                    fcntl.flock(data, fcntl.LOCK_EX)
+                try:
+                    offset = data.seek(0, os.SEEK_END)
+                    data.write(member)
+                    data.flush()
+                    os.fsync(data.fileno())
+                    block = {
+                        "offset": offset, "length": len(member), "count": len(records),
+                        "min_ts": min(stamps) if stamps else None, "max_ts": max(stamps) if stamps else None,
+                        "undated": len(stamps) < len(records), "archived_at": int(now), "links": hashes,
+                    }
+                    with open(self._path(month, INDEX_SUFFIX), "a", encoding="utf-8") as index:
+                        index.write(json.dumps(block) + "\n")
+                    known.update(batch)
+                    self._links[month] = (self._index_stamp(month), known)
+                finally:
+                    if fcntl:
+                        fcntl.flock(data, fcntl.LOCK_UN)
+            return len(records)
+
+    def _index_stamp(self, month: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._path(month, INDEX_SUFFIX))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _month_links(self, month: str) -> Set[str]:
+        """分割內已封存連結的雜湊；索引檔被其他程序附加過 (mtime / 大小改變) 時重新載入"""
+        stamp = self._index_stamp(month)
+        cached = self._links.get(month)
+        if cached is None or cached[0] != stamp:
+            cached = self._links[month] = (stamp, {h for block in self.blocks(month) for h in block["links"]})
+        return cached[1]
+
+    def contains(self, link: str) -> bool:
+        """是否已封存 (逐月讀取索引，不快取；僅供查詢用，寫入時只比對當月)"""
+        h = link_hash(link)
+        return any(h in block["links"] for month in self.months() for block in self.blocks(month))
+
+    # ---------- 讀取 ----------
+
+    def months(self) -> List[str]:
+        """已有的分割 (新到舊)"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted((name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.root) if name.endswith(INDEX_SUFFIX)),
+                      reverse=True)
+
+    def blocks(self, month: str) -> List[Dict[str, Any]]:
+        """分割的索引 (每個 member 一筆)；寫入中斷留下的不完整行略過"""
+        blocks = []
+        try:
+            with open(self._path(month, INDEX_SUFFIX), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        blocks.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except OSError:
+            pass
+        return blocks
+
+    def stats(self, month: str) -> Tuple[int, int]:
+        """分割的 (筆數, member 數)；索引檔未變動時沿用上次解析的結果"""
+        stamp = self._index_stamp(month)
+        if stamp is None:
+            return 0, 0
+        cached = self._stats.get(month)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        blocks = self.blocks(month)
+        result = (sum(block["count"] for block in blocks), len(blocks))
+        self._stats[month] = (stamp, result)
+        return result
+
+    def count(self, month: Optional[str] = None) -> int:
+        months = [month] if month else self.months()
+        return sum(self.stats(m)[0] for m in months)
+
+    def read(self, month: str, since: Optional[int] = None, until: Optional[int] = None,
+             newest_first: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        逐筆讀出分割內的項目 (lazy；只解壓時間範圍重疊的 member)
+        :param since / until: 發布時間區間 [since, until)，UTC epoch
+        :param newest_first: 依封存順序由新到舊
+        """
+        blocks = [b for b in self.blocks(month) if _overlaps(b, since, until)]
+        if not blocks:
+            return
+        if newest_first:
+            blocks.reverse()
+        sealed = month < month_of(time.time())
+        with open(self._path(month, DATA_SUFFIX), "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if sealed else None
+            try:
+                for block in blocks:
+                    if view is not None:
+                        raw = view[block["offset"]:block["offset"] + block["length"]]
+                    else:
+                        f.seek(block["offset"])
+                        raw = f.read(block["length"])
+                    records = [json.loads(line) for line in gzip.decompress(raw).decode("utf-8").splitlines()]
+                    if newest_first:
+                        records.reverse()
+                    for record in records:
+                        ts = record.get("published_ts")
+                        if ts is not None and ((since is not None and ts < since) or (until is not None and ts >= until)):
+                            continue
+                        yield record
+            finally:
+                if view is not None:
+                    view.close()
+
+    def size_bytes(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.root, name)) for name in os.listdir(self.root))
@@ -0,0 +1,6 @@
+"""
+離線效能基準測試
+
+以本機 HTTP 伺服器模擬 Google News RSS，量測抓取、Prompt 產生與歷史資料庫操作的耗時。
+用法見 bench/run.py。
+"""
@@ -0,0 +1,138 @@
+"""
+本機 Google News RSS 模擬伺服器
+
+- 任何路徑皆回傳以 bench.payloads.build_feed 產生的 RSS；同一路徑 (含 query) 內容固定
+- 可設定延遲、抖動、錯誤率 (回傳 503) 與每個 feed 的筆數
+- 支援 ETag / If-None-Match (304)，可量測條件式請求
+"""
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from bench.payloads import build_feed, load_templates
+
+# ================= 1. Constants =================
+
+DEFAULT_ITEMS: int = 100      # Google News 單一查詢最多約 100 則
+
+# ================= 2. Server =================
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def do_GET(self) -> None:
+        owner = self.server.owner
+        owner._delay()
+        with owner._lock:
+            owner.stats["requests"] += 1
+            failed = owner._rng.random() < owner.error_rate
+            if failed:
+                owner.stats["errors"] += 1
+        if failed:
+            self._reply(503, b"")
+            return
+
+        body, etag = owner._payload(self.path)
+        if self.headers.get("If-None-Match") == etag:
+            with owner._lock:
+                owner.stats["not_modified"] += 1
+            self._reply(304, b"", {"ETag": etag})
+            return
+        self._reply(200, body, {"ETag": etag, "Content-Type": "application/xml; charset=UTF-8"})
+
+    def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    owner: "FeedServer"
+
+
+class FeedServer:
+    """
+    :param items: 每個 feed 的新聞數
+    :param latency: 每個請求的基本延遲 (秒)
+    :param jitter: 延遲額外隨機增加 0 ~ jitter 秒
+    :param error_rate: 回傳 503 的機率 (0 ~ 1)
+    :param seed: 亂數種子 (內容與錯誤序列皆可重現)
+
+    用法:
+        with FeedServer(items=50, latency=0.05) as server:
+            logic.GOOGLE_NEWS_RSS = server.base_url
+    """
+
+    def __init__(self, items: int = DEFAULT_ITEMS, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.items = items
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "not_modified": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._templates = load_templates()
+        self._payloads: Dict[str, List] = {}
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/rss/search"
+
+    def _delay(self) -> None:
+        with self._lock:
+            extra = self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def _payload(self, path: str):
+        """同一路徑只產生一次；ETag 取內容 CRC"""
+        with self._lock:
+            cached = self._payloads.get(path)
+            if cached is None:
+                body = build_feed(self.items, seed=self.seed ^ zlib.crc32(path.encode()),
+                                  templates=self._templates)
+                cached = self._payloads[path] = [body, f'"{zlib.crc32(body):08x}"']
+        return cached
+
+    def reset(self) -> None:
+        """清除已產生的內容與統計 (下一次請求重新產生，ETag 隨之改變)"""
+        with self._lock:
+            self._payloads.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def start(self) -> "FeedServer":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-feed-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FeedServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
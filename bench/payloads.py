@@ -0,0 +1,181 @@
+"""
+RSS 測試資料
+
+- bench/fixtures/*.xml 為 Google News RSS 原始回應 (隨附一份範例，可用 record 錄製更多)
+- build_feed 以錄製的 <item> 為範本，放大成任意筆數：標題重組、連結唯一、
+  發布時間改為「現在往前」，確保通過 logic 的日期篩選
+- 同一 seed 產生的內容固定，結果可重現
+
+錄製:
+    python -m bench.payloads --record --mode vip --days 7
+"""
+import argparse
+import base64
+import email.utils
+import glob
+import html
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from news_entry import NewsEntry
+
+# ================= 1. Constants =================
+
+FIXTURE_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_ITEM_RE = re.compile(r"<item>.*?</item>", re.S)
+_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.S)
+_SOURCE_RE = re.compile(r"<source[^>]*>(.*?)</source>", re.S)
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'\-]+|[一-鿿]{2,}")
+
+CHANNEL_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+    '<generator>NFE/5.0</generator><title>{title} - Google News</title>'
+    '<link>https://news.google.com/search?q={title}</link><language>en-ID</language>'
+    '<lastBuildDate>{now}</lastBuildDate><description>Google News</description>'
+)
+CHANNEL_TAIL = "</channel></rss>"
+
+ITEM_TEMPLATE = (
+    '<item><title>{title} - {source}</title>'
+    '<link>https://news.google.com/rss/articles/{article}?oc=5</link>'
+    '<guid isPermaLink="false">{article}</guid><pubDate>{date}</pubDate>'
+    '<description>&lt;a href="https://news.google.com/rss/articles/{article}?oc=5" target="_blank"&gt;'
+    '{title}&lt;/a&gt;&amp;nbsp;&amp;nbsp;&lt;font color="#6f6f6f"&gt;{source}&lt;/font&gt;</description>'
+    '<source url="{source_url}">{source}</source></item>'
+)
+
+# ================= 2. Templates =================
+
+def _strip_suffix(title: str, source: str) -> str:
+    suffix = f" - {source}"
+    return title[:-len(suffix)] if source and title.endswith(suffix) else title
+
+def load_templates(fixture_dir: str = FIXTURE_DIR) -> List[Dict[str, str]]:
+    """讀取所有錄製檔的 <item>，回傳 [{title, source}] (標題已去掉媒體字尾)"""
+    templates = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.xml"))):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        for block in _ITEM_RE.findall(raw):
+            title = _TITLE_RE.search(block)
+            source = _SOURCE_RE.search(block)
+            if not title:
+                continue
+            source_name = html.unescape(source.group(1)) if source else "Unknown"
+            templates.append({"title": _strip_suffix(html.unescape(title.group(1)), source_name),
+                              "source": source_name})
+    if not templates:
+        raise FileNotFoundError(f"{fixture_dir} 沒有可用的 RSS 錄製檔")
+    return templates
+
+# ================= 3. Feed Builder =================
+
+# 合成詞的音節；範本詞彙有限，需補足詞庫才不會讓標題過度相似 (否則近似重複比對會退化)
+_SYLLABLES = ["ba", "ta", "ka", "ma", "ri", "su", "wi", "jo", "ne", "lu", "pan", "sen", "dar", "kon", "tri"]
+SYNTHETIC_WORDS: int = 3000
+KEEP_RATIO: float = 0.3     # 保留範本原詞的比例；過高時同範本標題過於相似，不像真實資料
+
+
+def _vocabulary(templates: List[Dict[str, str]]) -> List[str]:
+    words = {w for t in templates for w in _WORD_RE.findall(t["title"])}
+    rng = random.Random(len(words))
+    while len(words) < SYNTHETIC_WORDS:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(words)
+
+def _title(rng: random.Random, template: Dict[str, str], vocab: List[str]) -> str:
+    """保留部分範本原詞、其餘替換為詞庫中的詞，使標題彼此不同但仍帶有真實用語"""
+    words = [w if rng.random() < KEEP_RATIO else rng.choice(vocab) for w in template["title"].split()]
+    words.append(rng.choice(vocab))
+    return " ".join(words)
+
+def build_feed(items: int, seed: int = 0, spread_hours: float = 20.0,
+               templates: Optional[List[Dict[str, str]]] = None) -> bytes:
+    """
+    產生含 items 則新聞的 RSS
+    :param seed: 同一 seed 內容固定 (時間除外，皆相對於現在)
+    :param spread_hours: 發布時間分布在現在往前幾小時內 (預設落在「1天」範圍)
+    """
+    templates = templates or load_templates()
+    vocab = _vocabulary(templates)
+    rng = random.Random(seed)
+    now = time.time()
+    parts = [CHANNEL_HEAD.format(title=f"bench-{seed}", now=email.utils.formatdate(now, usegmt=True))]
+    for i in range(items):
+        template = templates[rng.randrange(len(templates))]
+        title = _title(rng, template, vocab)
+        article = base64.urlsafe_b64encode(f"bench:{seed}:{i}".encode()).decode().rstrip("=")
+        source = template["source"]
+        parts.append(ITEM_TEMPLATE.format(
+            title=html.escape(title, quote=False),
+            source=html.escape(source, quote=False),
+            source_url=f"https://{re.sub(r'[^a-z0-9]+', '', source.lower()) or 'news'}.example",
+            article=article,
+            date=email.utils.formatdate(now - rng.uniform(0, spread_hours * 3600), usegmt=True),
+        ))
+    parts.append(CHANNEL_TAIL)
+    return "".join(parts).encode("utf-8")
+
+def build_items(count: int, seed: int = 0, spread_days: float = 30.0,
+                templates: Optional[List[Dict[str, str]]] = None) -> List[NewsEntry]:
+    """產生 NewsStore.save_items 格式的項目 (歷史資料庫測試用)"""
+    templates = templates or load_templates()
+    vocab = _vocabulary(templates)
+    rng = random.Random(seed)
+    now = time.time()
+    categories = ["總體經濟", "產業趨勢", "重點台商", "深度追蹤"]
+    items = []
+    for i in range(count):
+        template = templates[rng.randrange(len(templates))]
+        items.append(NewsEntry(
+            f"{_title(rng, template, vocab)} - {template['source']}",
+            f"https://news.google.com/rss/articles/bench-{seed}-{i}",
+            ts=int(now - rng.uniform(0, spread_days * 86400)),
+            source=template["source"],
+            category=rng.choice(categories),
+        ))
+    return items
+
+# ================= 4. Recording =================
+
+def record(mode: str, days: int, keyword: Optional[str] = None, fixture_dir: str = FIXTURE_DIR) -> List[str]:
+    """抓取真實 Google News RSS 存入 fixture 目錄，回傳寫入的檔案路徑"""
+    import logic
+
+    written = []
+    for idx, source in enumerate(logic.get_rss_sources(days, mode, keyword)):
+        try:
+            body = logic.FETCHER.fetch(source["url"])[0]
+        except Exception as e:
+            print(f"錄製失敗 {source['name']}: {e}", file=sys.stderr)
+            continue
+        path = os.path.join(fixture_dir, f"recorded_{mode}_{days}d_{idx}.xml")
+        with open(path, "wb") as f:
+            f.write(body)
+        written.append(path)
+    return written
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="錄製 Google News RSS 作為 benchmark 測試資料")
+    parser.add_argument("--record", action="store_true", help="從 Google News 錄製 (需要網路)")
+    parser.add_argument("--mode", default="macro", help="custom / macro / industry / vip")
+    parser.add_argument("--keyword", default=None)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args(argv)
+    if not args.record:
+        templates = load_templates()
+        print(f"{FIXTURE_DIR}: {len(templates)} 則範本")
+        return 0
+    written = record(args.mode, args.days, args.keyword)
+    for path in written:
+        print(path)
+    return 0 if written else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
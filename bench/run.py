@@ -0,0 +1,317 @@
+"""
+Benchmark 執行器
+
+量測項目 (全部離線，RSS 由 bench.feed_server 提供):
+- get_rss_sources/<mode>          組出查詢 URL
+- fetch_feed/<cold|hit|revalidated>  單一來源抓取 + 解析 (無快取 / TTL 內 / 304)
+- generate/<mode>/<cold|cached>   generate_chatgpt_prompt 端到端 (不使用快照)
+- history_merge/<size>            100 則新項目寫入已有 size 筆的歷史資料庫 (NewsStore.save_items)
+- history_filter/<size>/<case>    歷史頁查詢 + 卡片 HTML (同 app.py 的一頁)
+
+用法:
+    python -m bench.run                                   # 預設 1k / 10k / 100k
+    python -m bench.run --sizes 1000 --output report.json
+    python -m bench.run --save-baseline bench/baseline.json
+    python -m bench.run --baseline bench/baseline.json    # 退步超過容許值時 exit code 1
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import logic
+import render
+from archive import Archive
+from bench.feed_server import FeedServer
+from bench.payloads import build_items, load_templates
+from feed_cache import FeedCache
+from storage import NewsStore
+
+# ================= 1. Constants =================
+
+DEFAULT_SIZES: List[int] = [1_000, 10_000, 100_000]
+DEFAULT_REPEAT: int = 7
+DEFAULT_TOLERANCE: float = 0.20     # 中位數變慢超過 20% 視為退步
+DEFAULT_MIN_DELTA_MS: float = 1.0   # 且絕對差距需超過此值，避免極短項目的雜訊
+MERGE_BATCH: int = 100              # 每次掃描約新增的項目數
+POPULATE_CHUNK: int = 5_000
+
+MODES: List[str] = ["custom", "macro", "industry", "vip"]
+BENCH_KEYWORD: str = "Nickel"
+BENCH_DAYS: int = 1
+
+# history_filter 的查詢組合 (與歷史頁相同的參數)
+FILTER_CASES: Dict[str, Dict[str, Any]] = {
+    "recent": {},
+    "text_en": {"query": "Indonesia"},
+    "text_zh": {"query": "印尼"},
+    "text_or": {"query": "Foxconn | Pegatron"},
+    "category": {"categories": ["產業趨勢"]},
+    "text_category_week": {"query": "battery", "categories": ["產業趨勢"], "since_days": 7},
+    "deep_page": {"page": 20},
+}
+
+# ================= 2. Timing =================
+
+def measure(fn: Callable[[], Any], repeat: int = DEFAULT_REPEAT, number: int = 1,
+            setup: Optional[Callable[[], None]] = None, warmup: int = 1) -> Dict[str, Any]:
+    """
+    :param number: 每次取樣連續執行的次數 (極短的函式用來攤平計時誤差)
+    :param setup: 每次取樣前執行，不計入時間
+    :return: 單次執行的毫秒數統計
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - started) / number * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": len(samples),
+    }
+
+# ================= 3. Benchmarks =================
+
+class Workspace:
+    """暫存目錄 + 將 logic 的快取、資料庫、RSS 端點暫時換成測試用的實例"""
+
+    def __init__(self, server: FeedServer):
+        self.server = server
+        self.root = tempfile.mkdtemp(prefix="amy-bench-")
+        self._saved: Dict[str, Any] = {}
+        self._counter = 0
+
+    def path(self, name: str) -> str:
+        self._counter += 1
+        return os.path.join(self.root, f"{self._counter}-{name}")
+
+    def fresh_cache(self, ttl: int = logic.FEED_CACHE_TTL) -> FeedCache:
+        logic.FEED_CACHE = FeedCache(self.path("feeds"), ttl=ttl)
+        return logic.FEED_CACHE
+
+    def fresh_store(self) -> NewsStore:
+        logic.NEWS_STORE = NewsStore(self.path("news.db"), legacy_json=None, tagger=logic.TAGGER,
+                                     archive=Archive(self.path("archive")))
+        return logic.NEWS_STORE
+
+    def __enter__(self) -> "Workspace":
+        for name in ("FEED_CACHE", "NEWS_STORE", "GOOGLE_NEWS_RSS"):
+            self._saved[name] = getattr(logic, name)
+        logic.GOOGLE_NEWS_RSS = self.server.base_url
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for name, value in self._saved.items():
+            setattr(logic, name, value)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def bench_sources(results: Dict[str, Any], repeat: int) -> None:
+    for mode in MODES:
+        keyword = BENCH_KEYWORD if mode == "custom" else None
+        results[f"get_rss_sources/{mode}"] = measure(
+            lambda: logic.get_rss_sources(7, mode, keyword), repeat=repeat, number=500)
+
+
+def bench_fetch(results: Dict[str, Any], ws: Workspace, repeat: int) -> None:
+    source = logic.get_rss_sources(BENCH_DAYS, "macro")[0]
+
+    def _check():
+        _, feed = logic.fetch_feed(source)
+        if feed is None:
+            raise RuntimeError("fetch_feed 回傳 None")
+
+    results["fetch_feed/cold"] = measure(_check, repeat=repeat, setup=ws.fresh_cache)
+
+    ws.fresh_cache(ttl=3600)
+    _check()
+    results["fetch_feed/hit"] = measure(_check, repeat=repeat)
+
+    ws.fresh_cache(ttl=0)
+    _check()
+    results["fetch_feed/revalidated"] = measure(_check, repeat=repeat)
+
+
+def bench_generate(results: Dict[str, Any], ws: Workspace, repeat: int) -> None:
+    for mode in MODES:
+        keyword = BENCH_KEYWORD if mode == "custom" else None
+
+        def _run():
+            # 「Prompt 超出」等提示不影響結果，避免洗版
+            with contextlib.redirect_stderr(io.StringIO()):
+                _, items = logic.generate_chatgpt_prompt("1天", BENCH_DAYS, mode, keyword, use_snapshot=False)
+            if not items:
+                raise RuntimeError(f"{mode}: 沒有抓到任何新聞")
+
+        def _cold():
+            ws.fresh_cache()
+            ws.fresh_store()
+
+        results[f"generate/{mode}/cold"] = measure(_run, repeat=repeat, setup=_cold)
+
+        ws.fresh_cache(ttl=3600)
+        _run()
+        results[f"generate/{mode}/cached"] = measure(_run, repeat=repeat, setup=ws.fresh_store)
+
+
+def _populate(store: NewsStore, size: int) -> None:
+    for start in range(0, size, POPULATE_CHUNK):
+        store.save_items(build_items(min(POPULATE_CHUNK, size - start), seed=start + 1))
+
+
+def bench_history(results: Dict[str, Any], ws: Workspace, sizes: List[int], repeat: int) -> None:
+    now = int(time.time())
+    for size in sizes:
+        started = time.time()
+        store = ws.fresh_store()
+        _populate(store, size)
+        print(f"  歷史資料庫 {size:,} 筆建立完成 ({time.time() - started:.1f}s)", file=sys.stderr)
+
+        batches = iter(range(10_000_000, 20_000_000))
+        pending: List[List[Dict[str, str]]] = []
+
+        def _next_batch():
+            pending[:] = [build_items(MERGE_BATCH, seed=next(batches), spread_days=1)]
+
+        results[f"history_merge/{size}"] = measure(lambda: store.save_items(pending[0]),
+                                                   repeat=repeat, setup=_next_batch)
+
+        for case, params in FILTER_CASES.items():
+            since = now - params["since_days"] * 86400 if "since_days" in params else None
+            page = params.get("page", 0)
+
+            def _page():
+                rows = store.search(params.get("query", ""), categories=params.get("categories", ()),
+                                    since=since, limit=render.PAGE_SIZE + 1, offset=page * render.PAGE_SIZE)
+                render.render_cards(rows[:render.PAGE_SIZE], "歷史")
+
+            results[f"history_filter/{size}/{case}"] = measure(_page, repeat=repeat)
+
+# ================= 4. Report & Baseline =================
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE,
+            min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> List[str]:
+    """:return: 退步項目的說明 (空 list 表示沒有退步)"""
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, current in report["results"].items():
+        base = base_results.get(name)
+        if not base:
+            continue
+        before, after = base["median_ms"], current["median_ms"]
+        if after > before * (1 + tolerance) and after - before > min_delta_ms:
+            regressions.append(f"{name}: {before:.2f}ms -> {after:.2f}ms (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _print_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    base_results = (baseline or {}).get("results", {})
+    width = max((len(n) for n in results), default=10)
+    print(f"{'benchmark':<{width}}  {'median':>10}  {'p95':>10}  {'baseline':>10}", file=sys.stderr)
+    for name, r in results.items():
+        base = base_results.get(name, {}).get("median_ms")
+        base_text = f"{base:.2f}" if base is not None else "-"
+        print(f"{name:<{width}}  {r['median_ms']:>10.2f}  {r['p95_ms']:>10.2f}  {base_text:>10}", file=sys.stderr)
+
+
+def run(sizes: List[int], repeat: int = DEFAULT_REPEAT, items: int = 100, latency: float = 0.0,
+        jitter: float = 0.0, error_rate: float = 0.0, only: Optional[str] = None) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    groups = {
+        "get_rss_sources": lambda ws: bench_sources(results, repeat),
+        "fetch_feed": lambda ws: bench_fetch(results, ws, repeat),
+        "generate": lambda ws: bench_generate(results, ws, repeat),
+        "history": lambda ws: bench_history(results, ws, sizes, repeat),
+    }
+    with FeedServer(items=items, latency=latency, jitter=jitter, error_rate=error_rate) as server, \
+            Workspace(server) as ws:
+        for name, fn in groups.items():
+            if only and not name.startswith(only):
+                continue
+            print(f"[{name}]", file=sys.stderr)
+            fn(ws)
+        requests = dict(server.stats)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixture_templates": len(load_templates()),
+            "params": {"sizes": sizes, "repeat": repeat, "items": items, "latency": latency,
+                       "jitter": jitter, "error_rate": error_rate},
+            "server": requests,
+        },
+        "results": results,
+    }
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="離線 benchmark (本機模擬 Google News RSS)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="歷史資料庫筆數，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每項取樣次數")
+    parser.add_argument("--items", type=int, default=100, help="每個 feed 的新聞數")
+    parser.add_argument("--latency", type=float, default=0.0, help="模擬伺服器延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延遲額外隨機增加的上限 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 503 的機率")
+    parser.add_argument("--only", default=None,
+                        help="只執行指定群組 (get_rss_sources / fetch_feed / generate / history)")
+    parser.add_argument("--output", default=None, help="報告 JSON 路徑 (預設輸出到 stdout)")
+    parser.add_argument("--baseline", default=None, help="與此報告比較，退步時 exit code 1")
+    parser.add_argument("--save-baseline", default=None, help="將本次結果存為 baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="容許變慢比例")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS, help="容許的絕對差距 (毫秒)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run(sizes, repeat=args.repeat, items=args.items, latency=args.latency,
+                 jitter=args.jitter, error_rate=args.error_rate, only=args.only)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_table(report["results"], baseline)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("效能退步:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
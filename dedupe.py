@@ -0,0 +1,167 @@
+"""
+近似重複標題分群 (MinHash + LSH)
+
+- 標題先去掉 Google News 附加的「 - 媒體名」字尾，再以 search.tokenize 切詞
+  (中文 bigram、英文單字)
+- 每個標題計算 16 個 MinHash 值，切成 8 段 (band) 各 2 個值；
+  任一段完全相同即為候選 (Jaccard 0.7 時成為候選的機率約 99.5%)
+- 候選再以詞集合 Jaccard 相似度確認
+- 整體約為線性時間，不需兩兩比對
+
+跨語言的同一則新聞 (中文 vs 英文標題) 只有在共用多數詞彙時才會被歸為一群。
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from news_entry import NewsEntry
+from search import tokenize
+
+# ================= 1. Constants =================
+
+NUM_PERM: int = 16
+BANDS: int = 8
+ROWS: int = NUM_PERM // BANDS
+MIN_JACCARD: float = 0.7      # 詞集合相似度下限
+MAX_BUCKET_SCAN: int = 50     # 每個 bucket 最多比對最近的幾筆，避免極端資料退化成平方時間
+
+_PRIME = (1 << 61) - 1
+# 固定的雜湊參數 (a, b)，確保指紋在不同程序間一致、可存入資料庫
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+    for i in range(NUM_PERM)
+]
+
+# 「標題 - 媒體」或「標題 | 媒體」字尾
+_SUFFIX_RE = re.compile(r"\s+[-|｜–—]\s+[^-|｜–—]{1,40}$")
+
+# ================= 2. Fingerprint =================
+
+def normalize_title(title: str) -> str:
+    return _SUFFIX_RE.sub("", title or "").strip()
+
+def fingerprint(title: str) -> Set[str]:
+    """標題的詞集合"""
+    return set(tokenize(normalize_title(title)))
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def minhash(tokens: Set[str]) -> List[int]:
+    hashes = [_token_hash(t) for t in tokens]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+def band_keys(tokens: Set[str]) -> List[int]:
+    """LSH bucket key (每段含段編號，56-bit，可直接存入 SQLite INTEGER)；空集合不產生 key"""
+    if not tokens:
+        return []
+    signature = minhash(tokens)
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        raw = f"{band}:" + ",".join(map(str, values))
+        keys.append(int.from_bytes(hashlib.blake2b(raw.encode(), digest_size=7).digest(), "big"))
+    return keys
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def is_near_duplicate(a: Set[str], b: Set[str]) -> bool:
+    return jaccard(a, b) >= MIN_JACCARD
+
+# ================= 3. Clustering =================
+
+@dataclass
+class Cluster:
+    representative: NewsEntry
+    members: List[NewsEntry] = field(default_factory=list)
+
+    @property
+    def sources(self) -> Set[str]:
+        return {m.source for m in self.members}
+
+
+def cluster_items(items: List[NewsEntry]) -> List[Cluster]:
+    """
+    將近似重複的新聞分群，保留先出現者為代表
+    代表項目會加上 covered_by (報導的不同媒體數)
+    """
+    buckets: Dict[int, List[int]] = {}
+    prints: List[Set[str]] = []
+    parent: List[int] = []
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for idx, item in enumerate(items):
+        fp = fingerprint(item.title)
+        prints.append(fp)
+        parent.append(idx)
+        for key in band_keys(fp):
+            for other in buckets.get(key, [])[-MAX_BUCKET_SCAN:]:
+                if find(other) != find(idx) and is_near_duplicate(fp, prints[other]):
+                    # 以較早出現者為根
+                    a, b = sorted((find(other), find(idx)))
+                    parent[b] = a
+            buckets.setdefault(key, []).append(idx)
+
+    clusters: Dict[int, Cluster] = {}
+    for idx, item in enumerate(items):
+        root = find(idx)
+        cluster = clusters.get(root)
+        if cluster is None:
+            cluster = clusters[root] = Cluster(items[root])
+        cluster.members.append(item)
+
+    for cluster in clusters.values():
+        cluster.representative.covered_by = max(len(cluster.sources), 1)
+    return list(clusters.values())
+
+
+class IncrementalClusterer:
+    """
+    逐筆分群 (串流顯示用)：新項目與既有項目近似時併入其群並更新代表的 covered_by，
+    否則成為新群代表。不會回頭合併兩個既有群，最終結果仍以 cluster_items 為準
+    """
+
+    def __init__(self):
+        self._buckets: Dict[int, List[int]] = {}
+        self._prints: List[Set[str]] = []
+        self._owner: List[int] = []          # 每個項目所屬群的編號
+        self._sources: List[Set[str]] = []   # 每群的報導媒體
+        self.representatives: List[NewsEntry] = []
+
+    def add(self, item: NewsEntry) -> bool:
+        """:return: True 表示 item 成為新群的代表"""
+        fp = fingerprint(item.title)
+        keys = band_keys(fp)
+        owner = None
+        for key in keys:
+            for other in self._buckets.get(key, [])[-MAX_BUCKET_SCAN:]:
+                if is_near_duplicate(fp, self._prints[other]):
+                    owner = self._owner[other]
+                    break
+            if owner is not None:
+                break
+
+        idx = len(self._prints)
+        self._prints.append(fp)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(idx)
+
+        if owner is None:
+            self._owner.append(len(self.representatives))
+            self._sources.append({item.source})
+            self.representatives.append(item)
+            return True
+        self._owner.append(owner)
+        self._sources[owner].add(item.source)
+        self.representatives[owner].covered_by = len(self._sources[owner])
+        return False
@@ -0,0 +1,150 @@
+"""
+掃描診斷
+
+每次掃描為每個來源記錄一筆 SourceReport (抓取耗時、位元組、狀態碼、快取、篩選前後筆數、錯誤)，
+彙整為 ScanDiagnostics，可輸出 JSON 或 Prometheus text format，方便找出慢或失敗的查詢。
+"""
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fetcher import FetchTrace
+
+# ================= 1. Constants =================
+
+METRIC_PREFIX: str = "amygo"
+
+# Prometheus 的階段耗時 (FetchTrace / SourceReport 欄位 -> phase label)
+_PHASES = (("dns", "dns_ms"), ("connect", "connect_ms"), ("transfer", "transfer_ms"),
+           ("total", "total_ms"))
+
+# ================= 2. Records =================
+
+@dataclass
+class SourceReport:
+    name: str
+    url: str
+    fetch: FetchTrace = field(default_factory=FetchTrace)
+    parse_ms: float = 0.0
+    entries_raw: int = 0      # feed 內的項目數
+    entries_kept: int = 0     # 筆數上限、日期與 delta 篩選後
+    entries_final: int = 0    # 跨來源去重後
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_row(self) -> Dict[str, Any]:
+        """攤平成單層 dict (表格顯示用)"""
+        row: Dict[str, Any] = {"來源": self.name, "狀態": "✅" if self.ok else f"❌ {self.error}"}
+        row.update({
+            "HTTP": self.fetch.status, "快取": self.fetch.cache or "-",
+            "DNS ms": round(self.fetch.dns_ms, 1), "連線 ms": round(self.fetch.connect_ms, 1),
+            "傳輸 ms": round(self.fetch.transfer_ms, 1), "解析 ms": round(self.parse_ms, 1),
+            "總計 ms": round(self.fetch.total_ms + self.parse_ms, 1),
+            "KB": round(self.fetch.bytes / 1024, 1), "嘗試": self.fetch.attempts,
+            "原始": self.entries_raw, "篩選後": self.entries_kept, "去重後": self.entries_final,
+        })
+        return row
+
+
+@dataclass
+class ScanDiagnostics:
+    """一次 run_scan 的診斷結果；由呼叫端建立後傳入，掃描過程中填入"""
+    mode: str = ""
+    keyword: str = ""
+    days: int = 0
+    started_at: float = field(default_factory=time.time)
+    duration_ms: float = 0.0
+    from_snapshot: bool = False
+    shared: str = ""          # 由程序內結果快取取得時為 "hit" / "coalesced" (見 result_cache.py)
+    sources: List[SourceReport] = field(default_factory=list)
+    # 輸出項目對應的高水位標記 {source_key: (發布時間, 連結)}；共用結果時據此推進各自的 scope
+    watermarks: Dict[str, Tuple[int, List[str]]] = field(default_factory=dict)
+
+    def add_source(self, name: str, url: str) -> SourceReport:
+        report = SourceReport(name, url)
+        self.sources.append(report)
+        return report
+
+    def copy_from(self, other: "ScanDiagnostics") -> None:
+        """沿用另一次掃描的量測 (共用結果時)"""
+        for name in ("mode", "keyword", "days", "started_at", "duration_ms", "from_snapshot", "sources",
+                     "watermarks"):
+            setattr(self, name, getattr(other, name))
+
+    @property
+    def failures(self) -> List[SourceReport]:
+        return [s for s in self.sources if not s.ok]
+
+    def slowest(self, n: int = 3) -> List[SourceReport]:
+        return sorted(self.sources, key=lambda s: s.fetch.total_ms + s.parse_ms, reverse=True)[:n]
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        return [s.to_row() for s in self.sources]
+
+    # ---------- 匯出 ----------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """Prometheus text exposition format (gauge)"""
+        scan = {"mode": self.mode, "keyword": self.keyword, "days": str(self.days)}
+        metrics: Dict[str, List[str]] = {}
+        helps = {
+            "scan_duration_seconds": "整體掃描耗時",
+            "scan_from_snapshot": "是否直接讀取快照 (1/0)",
+            "scan_shared": "是否沿用其他請求的結果 (1/0)",
+            "source_up": "來源抓取成功 (1/0)",
+            "source_phase_seconds": "來源各階段耗時",
+            "source_bytes": "下載位元組數 (解壓縮前)",
+            "source_http_status": "最後一次 HTTP 狀態碼",
+            "source_attempts": "請求次數 (含重試)",
+            "source_cache": "快取狀態 (該狀態為 1)",
+            "source_entries": "各階段項目數",
+        }
+
+        def _add(name: str, labels: Dict[str, str], value: float) -> None:
+            metrics.setdefault(name, []).append(f"{prefix}_{name}{_labels(labels)} {_number(value)}")
+
+        _add("scan_duration_seconds", scan, self.duration_ms / 1000)
+        _add("scan_from_snapshot", scan, int(self.from_snapshot))
+        _add("scan_shared", scan, int(bool(self.shared)))
+        for s in self.sources:
+            labels = {**scan, "source": s.name}
+            _add("source_up", labels, int(s.ok))
+            for phase, attr in _PHASES:
+                _add("source_phase_seconds", {**labels, "phase": phase}, getattr(s.fetch, attr) / 1000)
+            _add("source_phase_seconds", {**labels, "phase": "parse"}, s.parse_ms / 1000)
+            _add("source_bytes", labels, s.fetch.bytes)
+            if s.fetch.status is not None:
+                _add("source_http_status", labels, s.fetch.status)
+            _add("source_attempts", labels, s.fetch.attempts)
+            if s.fetch.cache:
+                _add("source_cache", {**labels, "status": s.fetch.cache}, 1)
+            for stage in ("raw", "kept", "final"):
+                _add("source_entries", {**labels, "stage": stage}, getattr(s, f"entries_{stage}"))
+
+        lines: List[str] = []
+        for name, samples in metrics.items():
+            lines.append(f"# HELP {prefix}_{name} {helps[name]}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+# ================= 3. Helper Functions =================
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
@@ -0,0 +1,170 @@
+"""
+RSS Feed 磁碟快取
+
+以 URL 為鍵保存原始 XML 與 ETag / Last-Modified，
+TTL 內直接讀本地檔案；過期後以條件式請求 (If-None-Match / If-Modified-Since)
+重新驗證，伺服器回 304 時沿用本地內容。
+容量以 LRU 方式控管 (總位元組數與筆數上限)。
+實際的網路請求由 fetcher.AsyncFetcher 負責。
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# ================= 1. Constants =================
+
+DEFAULT_CACHE_DIR: str = os.path.join(".cache", "feeds")
+DEFAULT_TTL: int = 600                       # 秒；TTL 內不發出任何請求
+DEFAULT_MAX_BYTES: int = 50 * 1024 * 1024    # 快取總容量上限
+DEFAULT_MAX_ENTRIES: int = 500               # 快取筆數上限
+
+USER_AGENT: str = "Mozilla/5.0 (compatible; AmyIndonesiaResearch/1.0; +feedparser)"
+
+# 快取狀態
+HIT = "hit"                  # TTL 內，直接使用本地內容
+REVALIDATED = "revalidated"  # 304，本地內容仍有效
+MISS = "miss"                # 重新下載
+STALE = "stale"              # 下載失敗，退回使用過期內容
+
+# ================= 2. Cache =================
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def validators(self) -> Dict[str, str]:
+        """條件式請求標頭"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class FeedCache:
+    """
+    以 URL 為鍵的 RSS 磁碟快取
+    :param cache_dir: 快取目錄
+    :param ttl: 新鮮期 (秒)
+    :param max_bytes: 總容量上限，超過時淘汰最久未使用的項目
+    :param max_entries: 筆數上限
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: int = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    # ---------- 路徑與檔案 ----------
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".xml"), os.path.join(self.cache_dir, key + ".json")
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # ---------- 讀寫 ----------
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """讀取快取項目 (不論是否過期)，並更新其 LRU 使用時間"""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or meta.get("size") != len(body):
+            return None  # 寫入中途或雜湊碰撞，視為未命中
+        try:
+            os.utime(meta_path)  # mtime 作為最後使用時間
+        except OSError:
+            pass
+        return CacheEntry(url, body, meta.get("etag"), meta.get("last_modified"), meta.get("fetched_at", 0.0))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def put(self, url: str, body: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> CacheEntry:
+        """寫入新內容 (先寫 body 再寫 meta，讀取端以 size 檢查一致性)"""
+        entry = CacheEntry(url, body, etag, last_modified, time.time())
+        self._write(entry)
+        self.evict()
+        return entry
+
+    def mark_revalidated(self, entry: CacheEntry) -> CacheEntry:
+        """收到 304 時重設新鮮期"""
+        entry.fetched_at = time.time()
+        self._write(entry, meta_only=True)
+        return entry
+
+    def _write(self, entry: CacheEntry, meta_only: bool = False) -> None:
+        body_path, meta_path = self._paths(entry.url)
+        meta = {
+            "url": entry.url, "etag": entry.etag, "last_modified": entry.last_modified,
+            "fetched_at": entry.fetched_at, "size": len(entry.body),
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not meta_only:
+                self._atomic_write(body_path, entry.body)
+            self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            print(f"快取寫入失敗: {e}", file=sys.stderr)
+
+    def evict(self) -> None:
+        """依最後使用時間淘汰，直到筆數與容量都在上限內"""
+        with self._lock:
+            try:
+                names = os.listdir(self.cache_dir)
+            except OSError:
+                return
+            items: List[Tuple[float, int, str]] = []
+            total = 0
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(self.cache_dir, name)
+                body_path = meta_path[:-5] + ".xml"
+                try:
+                    used_at = os.stat(meta_path).st_mtime
+                    size = os.stat(body_path).st_size
+                except OSError:
+                    continue
+                items.append((used_at, size, meta_path))
+                total += size
+
+            items.sort()  # 最久未使用在前
+            count = len(items)
+            for used_at, size, meta_path in items:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                for path in (meta_path, meta_path[:-5] + ".xml"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                count -= 1
+                total -= size
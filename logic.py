@@ -1,13 +1,28 @@
-import streamlit as st
+import argparse
+import calendar
 import feedparser
-import time
-from datetime import datetime, timedelta, timezone
-from email.utils import parsedate_to_datetime
 import json
-import os
+import re
+import socket
+import sys
+import time
+from datetime import datetime, timedelta
 import concurrent.futures
 import urllib.parse
-from typing import List, Dict, Tuple, Optional, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Any, Callable, Iterable, Iterator, Set
+
+from archive import Archive
+from feed_cache import FeedCache
+from dedupe import IncrementalClusterer, cluster_items
+from diagnostics import ScanDiagnostics, SourceReport
+from fetcher import AsyncFetcher, FetchError
+from news_entry import NewsEntry
+from prompt import PromptBuilder
+from query_plan import needs_split, or_query, plan_shards, shard_label, split_shard
+from result_cache import MISS as RESULT_MISS, ResultCache
+from storage import NewsStore
+from tagger import Tagger
 
 # ================= 1. Constants =================
 
@@ -27,12 +42,37 @@ VIP_COMPANIES_CN: List[str] = [
     '華碩', '宏碁'
 ]
 
-# 預先計算好查詢字串
-# Google News RSS strictness check: Use %20 for spaces
-# Use logic from verified fix: quote() and %20OR%20
-# Also user's version had wrapping parentheses, which is good for boolean logic security.
-VIP_QUERY_EN: str = "(" + "%20OR%20".join([urllib.parse.quote(c) for c in VIP_COMPANIES_EN]) + ")"
-VIP_QUERY_CN: str = "(" + "%20OR%20".join([urllib.parse.quote(c) for c in VIP_COMPANIES_CN]) + ")"
+# VIP 查詢依公司分片平行抓取 (見 query_plan.py)；Google News 以 %20 表示空白
+VIP_SHARD_SIZE: int = 4
+# 每次掃描的 VIP 分片請求上限 (含初始分片)；達上限後結果被截斷的分片也不再切分
+VIP_MAX_REQUESTS: int = 24
+# (段落名稱, 查詢前綴, 語系, 公司清單)
+VIP_GROUPS: List[Tuple[str, str, str, List[str]]] = [
+    ("🏢 台商動態 (中)", "印尼", "zh", VIP_COMPANIES_CN),
+    ("🏢 台商動態 (EN)", "Indonesia", "en", VIP_COMPANIES_EN),
+]
+# 公司標籤 (見 tagger.py)：中英文名稱歸為同一家，依此統計與篩選
+VIP_COMPANY_TAGS: Dict[str, List[str]] = {
+    "鴻海": ['富士康', '"Foxconn"', '"Hon Hai"'], "和碩": ['"Pegatron"'], "台達電": ['"Delta Electronics"'],
+    "仁寶": ['"Compal"'], "Gogoro": [], "光陽": ['"Kymco"'], "寶成": ['"Pou Chen"'],
+    "儒鴻": ['"Eclat Textile"'], "正新": ['"Cheng Shin"'], "中信銀": ['"CTBC Bank"'],
+    "華碩": ['"ASUS"'], "宏碁": ['"Acer"'],
+}
+
+# 主題關鍵字標籤 (標籤: 比對詞)；可自行增減
+KEYWORD_TAGS: Dict[str, List[str]] = {
+    "電動車": ["EV", "EVs", "electric vehicle", "electric vehicles", "電動車", "電動機車"],
+    "電池": ["battery", "batteries", "電池"],
+    "鎳礦": ["nickel", "鎳"],
+    "電子製造": ["electronics manufacturing", "電子製造", "電子業"],
+    "新首都": ["Nusantara", "IKN", "新首都"],
+    "台印關係": ["Taiwanese investment", "台商", "台印"],
+}
+
+LOCALE_PARAMS: Dict[str, str] = {
+    "zh": "hl=zh-TW&gl=TW&ceid=TW:zh-Hant",
+    "en": "hl=en-ID&gl=ID&ceid=ID:en",
+}
 
 # 選項映射
 DATE_MAP: Dict[str, int] = {
@@ -45,9 +85,49 @@ TOPIC_MAP: Dict[str, str] = {
     "重點台商": "vip"
 }
 
+# Google News RSS 搜尋端點 (benchmark 會改指向本機模擬伺服器)
+GOOGLE_NEWS_RSS: str = "https://news.google.com/rss/search"
+
 # 排除聚合轉載平台
 EXCLUDE_SITES = "%20-site:msn.com%20-site:aol.com"
 
+# RSS 磁碟快取 (TTL 秒數 / 容量上限)
+FEED_CACHE_TTL: int = 600
+FEED_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
+FEED_CACHE = FeedCache(ttl=FEED_CACHE_TTL, max_bytes=FEED_CACHE_MAX_BYTES)
+
+# 非同步抓取引擎 (共用 keep-alive 連線池)
+FETCH_TIMEOUT: float = 10.0      # 單一來源請求上限秒數
+SCAN_DEADLINE: float = 25.0      # 整體掃描上限秒數，逾時的來源視為無資料
+FETCH_MAX_PER_HOST: int = 4      # 每個 host 同時請求數
+FETCH_RETRIES: int = 2
+FETCHER = AsyncFetcher(timeout=FETCH_TIMEOUT, max_per_host=FETCH_MAX_PER_HOST, retries=FETCH_RETRIES)
+
+# Prompt token 上限 (約略估算)
+PROMPT_TOKEN_BUDGET: int = 12000
+
+# 公司 / 主題標籤器 (單次掃描標題即比對全部字典)
+TAGGER = Tagger({"company": VIP_COMPANY_TAGS, "keyword": KEYWORD_TAGS})
+
+# 月份封存 (gzip JSONL，只附加)：保存全部歷史
+ARCHIVE_DIR: str = "archive"
+# 資料庫 (熱資料) 保留天數；None 為全部保留，設定時需大於最長的時間範圍 (DATE_MAP)
+HOT_RETENTION_DAYS: Optional[int] = None
+
+# 歷史新聞資料庫 (首次開啟時自動匯入舊版 news_data.json；字典變更時重新標記)
+NEWS_STORE = NewsStore(tagger=TAGGER, archive=Archive(ARCHIVE_DIR), retention_days=HOT_RETENTION_DAYS)
+
+# 預設主題快照的有效秒數 (背景 worker 預設每 15 分鐘更新一次)
+SNAPSHOT_MAX_AGE: int = 30 * 60
+
+# 程序內共用結果快取：多個 session 同時查詢相同條件時只抓取一次，其餘等待並共用結果
+RESULT_CACHE_TTL: float = 120.0
+RESULT_CACHE_MAX_ENTRIES: int = 64
+RESULT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+# 高水位標記：每個來源記錄已看過的最新發布時間
+_DATE_FILTER_RE = re.compile(r"after:\d{4}-\d{2}-\d{2}%20before:\d{4}-\d{2}-\d{2}")
+
 # ================= 2. Helper Functions =================
 
 def _date_filter_query(days: int) -> str:
@@ -57,15 +137,6 @@ def _date_filter_query(days: int) -> str:
     before = today + timedelta(days=1)
     return f"after:{after}%20before:{before}{EXCLUDE_SITES}"
 
-def _is_within_range(published: str, days: int) -> bool:
-    """檢查 RSS entry 的 published 日期是否在指定天數範圍內"""
-    try:
-        pub_dt = parsedate_to_datetime(published)
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        return pub_dt >= cutoff
-    except Exception:
-        return True  # 無法解析時保留該筆
-
 def get_rss_sources(days: int, mode: str = "all", custom_keyword: Optional[str] = None) -> List[Dict[str, str]]:
     """
     產生 RSS 來源列表
@@ -83,11 +154,11 @@ def get_rss_sources(days: int, mode: str = "all", custom_keyword: Optional[str]
 
         sources.append({
             "name": f"🔍 深度追蹤: {clean_keyword} (中)",
-            "url": f"https://news.google.com/rss/search?q={encoded_keyword}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
+            "url": f"{GOOGLE_NEWS_RSS}?q={encoded_keyword}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
         })
         sources.append({
             "name": f"🔍 深度追蹤: {clean_keyword} (EN)",
-            "url": f"https://news.google.com/rss/search?q={encoded_keyword}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"
+            "url": f"{GOOGLE_NEWS_RSS}?q={encoded_keyword}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"
         })
         return sources
 
@@ -96,41 +167,218 @@ def get_rss_sources(days: int, mode: str = "all", custom_keyword: Optional[str]
 
     if mode == "macro":
         sources.extend([
-            {"name": "🇮🇩 印尼整體 (中)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('印尼')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
-            {"name": "🇮🇩 印尼整體 (EN)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('Indonesia')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"},
-            {"name": "🇹🇼 台印關係 (中)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('印尼 台灣 OR "台商"')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
-            {"name": "🇹🇼 台印關係 (EN)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('Indonesia Taiwan OR "Taiwanese investment"')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"}
+            {"name": "🇮🇩 印尼整體 (中)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('印尼')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
+            {"name": "🇮🇩 印尼整體 (EN)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('Indonesia')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"},
+            {"name": "🇹🇼 台印關係 (中)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('印尼 台灣 OR "台商"')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
+            {"name": "🇹🇼 台印關係 (EN)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('Indonesia Taiwan OR "Taiwanese investment"')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"}
         ])
     elif mode == "industry":
         sources.extend([
-            {"name": "⚡ EV/電子 (中)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('印尼 電動車 OR 電池 OR "電子製造"')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
-            {"name": "⚡ EV/Electronics (EN)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('Indonesia EV OR Battery OR Nickel OR Electronics Manufacturing')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"}
+            {"name": "⚡ EV/電子 (中)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('印尼 電動車 OR 電池 OR "電子製造"')}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
+            {"name": "⚡ EV/Electronics (EN)", "url": f"{GOOGLE_NEWS_RSS}?q={urllib.parse.quote('Indonesia EV OR Battery OR Nickel OR Electronics Manufacturing')}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"}
         ])
     elif mode == "vip":
-        sources.extend([
-            {"name": "🏢 台商動態 (中)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('印尼')}%20{VIP_QUERY_CN}%20{df}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"},
-            {"name": "🏢 台商動態 (EN)", "url": f"https://news.google.com/rss/search?q={urllib.parse.quote('Indonesia')}%20{VIP_QUERY_EN}%20{df}&hl=en-ID&gl=ID&ceid=ID:en"}
-        ])
+        for name, prefix, lang, companies in VIP_GROUPS:
+            sources.extend(_vip_source(name, prefix, lang, shard, days)
+                           for shard in plan_shards(companies, VIP_SHARD_SIZE))
     
     return sources
 
-def fetch_feed(source: Dict[str, str]) -> Tuple[Dict[str, str], Any]:
-    """Helper function to fetch a single RSS feed."""
+def _vip_source(name: str, prefix: str, lang: str, terms: List[str], days: int) -> Dict[str, Any]:
+    """單一分片的來源；terms 供結果過多時再切分，以及標記命中的公司"""
+    query = f"{urllib.parse.quote(prefix)}%20{or_query(terms)}%20{_date_filter_query(days)}"
+    return {"name": name, "url": f"{GOOGLE_NEWS_RSS}?q={query}&{LOCALE_PARAMS[lang]}",
+            "terms": list(terms), "prefix": prefix, "lang": lang}
+
+def describe_error(error: BaseException) -> str:
+    """抓取失敗原因的簡短說明 (顯示於 Prompt 與診斷面板)"""
+    if isinstance(error, FetchError):
+        return f"HTTP {error.status}"
+    if isinstance(error, (TimeoutError, concurrent.futures.TimeoutError)):
+        return f"逾時 ({error})" if str(error) else "逾時"
+    if isinstance(error, socket.gaierror):
+        return "DNS 解析失敗"
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+def _parse_body(body: bytes, report: SourceReport) -> Any:
+    """feedparser 解析並記錄耗時與項目數；空結果且格式錯誤時記為失敗"""
+    started = time.perf_counter()
+    feed = feedparser.parse(body)
+    report.parse_ms = (time.perf_counter() - started) * 1000
+    report.entries_raw = len(feed.entries)
+    if not feed.entries and feed.get("bozo"):
+        report.error = f"解析失敗: {feed.get('bozo_exception')}"
+    return feed
+
+def fetch_feed(source: Dict[str, str], report: Optional[SourceReport] = None) -> Tuple[Dict[str, str], Any]:
+    """
+    Helper function to fetch a single RSS feed (經由磁碟快取與條件式請求).
+    失敗時回傳 None，原因記錄在 report.error；未傳入 report 時輸出到 stderr
+    """
+    own_report = report is None
+    report = report or SourceReport(source['name'], source['url'])
+    try:
+        body, _ = FETCHER.fetch(source['url'], FEED_CACHE, trace=report.fetch)
+        return source, _parse_body(body, report)
+    except Exception as e:
+        report.error = describe_error(e)
+        if own_report:
+            print(f"抓取失敗 [{source['name']}]: {report.error}", file=sys.stderr)
+        return source, None
+
+def _parse_result(source: Dict[str, str], future: concurrent.futures.Future,
+                  report: SourceReport) -> Tuple[Dict[str, str], Any]:
+    """將抓取結果 (原始 bytes) 交給 feedparser 解析"""
     try:
-        return source, feedparser.parse(source['url'])
-    except Exception:
+        body, _ = future.result()
+        return source, _parse_body(body, report)
+    except Exception as e:
+        report.error = describe_error(e)
         return source, None
 
-def generate_chatgpt_prompt(days_label: str, days_int: int, search_mode: str, custom_keyword: Optional[str] = None) -> Tuple[str, List[Dict[str, str]]]:
+def source_key(url: str) -> str:
+    """來源的穩定識別鍵：去掉每天變動的 after:/before: 日期條件"""
+    return _DATE_FILTER_RE.sub("", url)
+
+def _snapshot_scope(search_mode: str, days_int: int) -> str:
+    """快照內容對應的高水位標記範圍；讀取快照的使用者以此推進自己的標記"""
+    return f"snapshot:{search_mode}:{days_int}"
+
+class _WatermarkTracker:
+    """delta 時依上次的高水位標記排除已看過的項目 (entry id 為連結)"""
+    __slots__ = ("seen_ts", "seen_ids", "skip_seen")
+
+    def __init__(self, mark: Tuple[Optional[int], Set[str]], skip_seen: bool):
+        self.seen_ts, self.seen_ids = mark
+        self.skip_seen = skip_seen and self.seen_ts is not None
+
+    def accept(self, ts: Optional[int], entry_id: str) -> bool:
+        if ts is None or not self.skip_seen:
+            return True
+        return not (ts < self.seen_ts or (ts == self.seen_ts and entry_id in self.seen_ids))
+
+def _emitted_marks(shard_items: List[Tuple[Dict[str, Any], List[NewsEntry]]], keys: Dict[str, str],
+                   emitted: Callable[[NewsEntry], bool]) -> Dict[str, Tuple[int, List[str]]]:
     """
-    執行爬蟲並生成 Prompt
+    依實際輸出到 Prompt 的項目計算各來源的新標記 {source_key: (發布時間, 該時間點的連結)}
+    標記不越過未輸出 (被 token 預算省略) 的項目，下次 delta 仍會列出；
+    比它們新、已輸出的項目因此可能再出現一次
     """
-    status_text = st.empty() 
-    progress_bar = st.progress(0)
-    
+    marks: Dict[str, Tuple[int, List[str]]] = {}
+    for source, items in shard_items:
+        dated = [item for item in items if item.ts is not None]
+        shown = [item.ts for item in dated if emitted(item)]
+        if not shown:
+            continue
+        held = [item.ts for item in dated if not emitted(item)]
+        top = min(max(shown), *held) if held else max(shown)
+        marks[keys[source['url']]] = (top, [item.link for item in dated if item.ts == top and emitted(item)])
+    return marks
+
+# ---------- 項目處理 (每個 feed 單次走訪：正規化 -> 時間篩選 -> 連結去重) ----------
+
+def _normalize_entries(raw_entries: Iterable[Any], category: str,
+                       tracker: _WatermarkTracker) -> Iterator[NewsEntry]:
+    """
+    feedparser entry -> NewsEntry
+    發布時間使用 feedparser 已解析好的 published_parsed (UTC struct_time)，不重新解析字串；
+    delta 排除的項目以整數比較先行略過，不建立記錄
+    """
+    for raw in raw_entries:
+        link = raw.get('link')
+        if not link:
+            continue
+        parsed = raw.get('published_parsed')
+        ts = calendar.timegm(parsed) if parsed else None
+        if not tracker.accept(ts, link):
+            continue
+        source_name = getattr(raw.get('source'), 'title', None) or "Google News"
+        yield NewsEntry(raw.get('title', ''), link, ts, source_name, category)
+
+def _within(entries: Iterable[NewsEntry], cutoff: int) -> Iterator[NewsEntry]:
+    """發布時間不早於 cutoff (沒有發布時間的保留)"""
+    return (entry for entry in entries if entry.ts is None or entry.ts >= cutoff)
+
+def _dedupe_links(entries: Iterable[NewsEntry], by_link: Dict[str, NewsEntry],
+                  terms: Optional[List[str]]) -> Iterator[NewsEntry]:
+    """
+    加上標籤並以連結去重 (by_link 跨來源共用)；
+    多個分片抓到同一則時只保留第一筆，標籤併入該筆
+    """
+    for entry in entries:
+        tags = _tag_title(entry.title, terms)
+        seen = by_link.get(entry.link)
+        if seen is not None:
+            seen.tags = _merge_tags(seen.tags, tags)
+            continue
+        entry.tags = tags
+        by_link[entry.link] = entry
+        yield entry
+
+def _merge_tags(tags: List[str], more: List[str]) -> List[str]:
+    """合併標籤並保持順序"""
+    return list(dict.fromkeys(tags + more))
+
+def _covered_terms(terms: List[str], entries: Iterable[Any]) -> Set[str]:
+    """分片中標題已命中的公司 (以比對詞對應的公司標籤判斷；不在字典中的比對詞視為未命中)"""
+    hits = {tag for entry in entries for tag in TAGGER.tag(entry.get('title', ''))}
+    return {term for term in terms if any(tag in hits for tag in TAGGER.tag(term))}
+
+def _tag_title(title: str, terms: Optional[List[str]] = None) -> List[str]:
+    """
+    標題的公司 / 主題標籤
+    Google 也會比對內文，標題沒有命中公司時，單一公司的分片仍可確定是哪一家
+    """
+    tags = TAGGER.tag(title)
+    if terms and len(terms) == 1 and not any(TAGGER.kind(t) == "company" for t in tags):
+        tags = _merge_tags(TAGGER.tag(terms[0]), tags)
+    return tags
+
+def _prompt_keywords(search_mode: str, custom_keyword: Optional[str]) -> List[str]:
+    """Prompt 取捨時優先保留命中這些詞的新聞"""
+    if search_mode == "custom" and custom_keyword:
+        return custom_keyword.split()
+    if search_mode == "vip":
+        return [c.strip('"') for c in VIP_COMPANIES_EN + VIP_COMPANIES_CN]
+    return []
+
+@dataclass
+class ScanUpdate:
+    """串流模式下每完成一個來源回報一次 (暫定結果；最終結果以 run_scan 的回傳值為準)"""
+    source: Dict[str, str]                 # 剛完成的來源
+    items: List[NewsEntry]                 # 此來源新增、尚未重複的新聞
+    news_list: List[NewsEntry] = field(default_factory=list)  # 目前累積的全部新聞
+    prompt: str = ""                       # 目前的 Prompt
+    done: int = 0
+    total: int = 0
+    error: Optional[str] = None            # 此來源的抓取失敗原因
+
+def run_scan(days_label: str, days_int: int, search_mode: str, custom_keyword: Optional[str] = None,
+             token_budget: Optional[int] = None,
+             on_progress: Optional[Callable[[int, int], None]] = None,
+             watermark_scope: Optional[str] = None, delta: bool = False,
+             diagnostics: Optional[ScanDiagnostics] = None,
+             on_update: Optional[Callable[[ScanUpdate], None]] = None) -> Tuple[str, List[NewsEntry]]:
+    """
+    執行爬蟲並生成 Prompt (不依賴 Streamlit，背景 worker 亦直接呼叫)
+    :param token_budget: Prompt token 上限 (預設 PROMPT_TOKEN_BUDGET)；超出時依新近程度、
+                         來源多樣性與關鍵字命中取捨，回傳的新聞列表仍包含全部項目
+    :param on_progress: 每完成一個來源呼叫一次 (已完成數, 總數)
+    :param watermark_scope: 記錄每個來源高水位標記的範圍 (例如 "cli" 或各使用者)；None 表示不記錄；
+                            標記只推進到實際輸出到 Prompt 的項目 (亦填入 diagnostics.watermarks)
+    :param delta: 只保留上次執行 (同一 scope) 之後的新項目，需搭配 watermark_scope
+    :param diagnostics: 傳入時填入每個來源的耗時、狀態與篩選筆數 (見 diagnostics.py)
+    :param on_update: 串流模式：每個來源解析完成即呼叫 (ScanUpdate)，不需等待最慢的來源；
+                      暫定結果以逐筆分群去重，全部完成後再以 cluster_items 產生最終結果
+    """
+    if delta and not watermark_scope:
+        raise ValueError("delta 模式需要 watermark_scope")
+    started = time.perf_counter()
+    diag = diagnostics if diagnostics is not None else ScanDiagnostics()
+    diag.mode, diag.keyword, diag.days = search_mode, custom_keyword or "", days_int
     # 呼叫 get_rss_sources，並傳入 days_int 作為 days 參數
     sources = get_rss_sources(days_int, search_mode, custom_keyword)
-    news_items_for_json = []
+    news_items_for_json: List[NewsEntry] = []
 
     if search_mode == "custom":
         instruction_prompt = f"針對關鍵字【{custom_keyword}】，請撰寫一份深度分析報告：1. 重點摘要 2. 市場影響 3. 機會與風險。"
@@ -143,91 +391,289 @@ def generate_chatgpt_prompt(days_label: str, days_int: int, search_mode: str, cu
     else:
         instruction_prompt = "請分析以下新聞。"
 
-    output_text = f"""
+    header = f"""
 請扮演一位資深的「東南亞產業分析師」。
 {instruction_prompt}
 請用**繁體中文**，並以 **Markdown** 條列式輸出，風格需專業且易讀。
 
 ========= 以下是新聞資料庫 ({datetime.now().strftime('%Y-%m-%d')}) =========
 """
+    if delta:
+        header += "※ 僅列出自上次執行後新增的新聞\n"
+
+    def _new_builder() -> PromptBuilder:
+        return PromptBuilder(header, "\n========= 資料結束 =========",
+                             budget=token_budget if token_budget is not None else PROMPT_TOKEN_BUDGET,
+                             keywords=_prompt_keywords(search_mode, custom_keyword), window_days=days_int)
+
+    builder = _new_builder()
     
-    seen_titles = set()
-    total_steps = len(sources)
-    
-    # 平行抓取 RSS
-    status_text.text(f"📡 正在平行掃描 {len(sources)} 個來源...")
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_source = {executor.submit(fetch_feed, source): source for source in sources}
-        
-        completed_count = 0
-        for future in concurrent.futures.as_completed(future_to_source):
-            completed_count += 1
-            progress_bar.progress(completed_count / total_steps)
-            
-            source, feed = future.result()
-            
-            if feed and len(feed.entries) > 0:
-                output_text += f"\\n## 【{source['name']}】\\n"
-                
-                # 自訂搜尋不設限，預設限制 30 篇
-                limit = len(feed.entries) if search_mode == "custom" else 30
-                
-                for entry in feed.entries[:limit]:
-                    if entry.title in seen_titles: continue
-                    pub_date = entry.published if 'published' in entry else ""
-                    if pub_date and not _is_within_range(pub_date, days_int):
-                        continue
-                    seen_titles.add(entry.title)
-                    source_name = getattr(entry.get('source', {}), 'title', None) or "Google News"
-                    link = entry.link
-                    
-                    output_text += f"- [{pub_date}] [{source_name}] {entry.title}\\n  連結: {link}\\n"
-                    news_items_for_json.append({
-                        "title": entry.title, "link": link, "date": pub_date,
-                        "source": source_name, "category": source['name']
-                    })
+    # 上次執行的高水位標記 {source_key: (最新發布時間, 該時間點的 entry id)}
+    keys = {source['url']: source_key(source['url']) for source in sources}
+    marks = NEWS_STORE.get_watermarks(watermark_scope, list(keys.values())) if watermark_scope else {}
+
+    # 平行抓取 RSS；分片查詢的結果接近上限時再切分並追加請求 (見 query_plan.py)
+    reports: Dict[str, SourceReport] = {}
+    pending: Dict[concurrent.futures.Future, Dict[str, Any]] = {}
+    shard_requests = sum(1 for source in sources if source.get('terms'))
+    capped: List[str] = []              # 因請求上限未再切分的分片
+
+    def _submit(source: Dict[str, Any]) -> None:
+        label = f"{source['name']} [{shard_label(source['terms'])}]" if source.get('terms') else source['name']
+        report = reports[source['url']] = diag.add_source(label, source['url'])
+        if source['url'] not in keys:
+            keys[source['url']] = source_key(source['url'])
+            if watermark_scope:
+                marks.update(NEWS_STORE.get_watermarks(watermark_scope, [keys[source['url']]]))
+        pending[FETCHER.submit(source['url'], FEED_CACHE, trace=report.fetch)] = source
+
+    for source in sources:
+        _submit(source)
+
+    def _completed():
+        """依完成順序產出結果 (途中可追加請求)；超過 SCAN_DEADLINE 仍未完成的來源取消並記錄為逾時"""
+        deadline = time.monotonic() + SCAN_DEADLINE
+        while pending:
+            done, _ = concurrent.futures.wait(list(pending), timeout=max(0.0, deadline - time.monotonic()),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                source = pending.pop(future)
+                yield _parse_result(source, future, reports[source['url']])
+        timed_out = list(pending.items())
+        pending.clear()
+        for future, source in timed_out:
+            future.cancel()
+            reports[source['url']].error = describe_error(TimeoutError(f"超過 {SCAN_DEADLINE:.0f} 秒"))
+            yield source, None
+
+    # 段落名稱 -> 項目；同一組的分片合併為一段，段落依第一次完成的順序排列
+    groups: Dict[str, List[NewsEntry]] = {}
+    group_urls: Dict[str, List[str]] = {}
+    shard_items: List[Tuple[Dict[str, Any], List[NewsEntry]]] = []
+    by_link: Dict[str, NewsEntry] = {}
+    cutoff = int(time.time()) - days_int * 86400   # 發布時間下限 (整次掃描只計算一次)
+
+    def _group_error(name: str) -> Optional[str]:
+        return next((reports[url].error for url in group_urls[name] if reports[url].error), None)
+
+    completed_count = 0
+    # 串流用的暫定結果 (逐筆去重；項目為副本，不影響最終分群)
+    clusterer = IncrementalClusterer()
+    partial_groups: Dict[str, List[NewsEntry]] = {}
+    for source, feed in _completed():
+        completed_count += 1
+        terms = source.get('terms')
+        if feed is not None and terms and needs_split(terms, len(feed.entries),
+                                                      _covered_terms(terms, feed.entries)):
+            halves = split_shard(terms)
+            if shard_requests + len(halves) <= VIP_MAX_REQUESTS:
+                shard_requests += len(halves)
+                for half in halves:
+                    _submit(_vip_source(source['name'], source['prefix'], source['lang'], half, days_int))
             else:
-                output_text += f"\\n## 【{source['name']}】\\n(無相關新聞)\\n"
+                capped.append(shard_label(terms))
+        total_steps = len(reports)
+        if on_progress:
+            on_progress(completed_count, total_steps)
+
+        section_items: List[NewsEntry] = []
+        if feed and len(feed.entries) > 0:
+            # 自訂搜尋不設限 (由 token 預算取捨)，預設限制 30 篇
+            limit = len(feed.entries) if search_mode == "custom" else 30
+            tracker = _WatermarkTracker(marks.get(keys[source['url']], (None, set())), skip_seen=delta)
+            entries = _normalize_entries(feed.entries[:limit], source['name'], tracker)
+            section_items = list(_dedupe_links(_within(entries, cutoff), by_link, terms))
+        reports[source['url']].entries_kept = len(section_items)
+        groups.setdefault(source['name'], []).extend(section_items)
+        group_urls.setdefault(source['name'], []).append(source['url'])
+        shard_items.append((source, section_items))
+
+        if on_update:
+            fresh = [copy for copy in (item.copy() for item in section_items) if clusterer.add(copy)]
+            partial_groups.setdefault(source['name'], []).extend(fresh)
+            partial_builder = _new_builder()
+            for name, items in partial_groups.items():
+                partial_builder.add_section(name, items, _group_error(name))
+            on_update(ScanUpdate(source, fresh, list(clusterer.representatives), partial_builder.build().text,
+                                 completed_count, total_steps, reports[source['url']].error))
+
+    # 跨來源近似重複分群：每群只保留一則代表，並記錄報導媒體數 (covered_by)、合併標籤
+    all_items = [item for items in groups.values() for item in items]
+    representatives = set()
+    representative_of: Dict[int, NewsEntry] = {}
+    aliases: Dict[str, List[NewsEntry]] = {}      # 代表連結 -> 同群其他項目 (存為別名)
+    for cluster in cluster_items(all_items):
+        representatives.add(id(cluster.representative))
+        representative_of.update((id(member), cluster.representative) for member in cluster.members)
+        if len(cluster.members) > 1:
+            aliases[cluster.representative.link] = [m for m in cluster.members if m is not cluster.representative]
+        cluster.representative.tags = _merge_tags([], [t for member in cluster.members for t in member.tags])
+    for source, section_items in shard_items:
+        reports[source['url']].entries_final = sum(1 for item in section_items if id(item) in representatives)
+    for name, section_items in groups.items():
+        kept = [item for item in section_items if id(item) in representatives]
+        builder.add_section(name, kept, _group_error(name))
+        news_items_for_json.extend(kept)
 
-    output_text += "\\n========= 資料結束 ========="
+    prompt_result = builder.build()
+    output_text = prompt_result.text
+    if prompt_result.dropped:
+        print(f"Prompt 超出 {builder.budget} tokens，省略 {len(prompt_result.dropped)} 則", file=sys.stderr)
+    if capped:
+        print(f"分片請求已達上限 {VIP_MAX_REQUESTS}，{len(capped)} 個分片未再切分: {', '.join(capped)}",
+              file=sys.stderr)
+    included = {id(item) for item in prompt_result.included}
+    new_marks = _emitted_marks(shard_items, keys,
+                               lambda item: id(representative_of.get(id(item), item)) in included)
+    diag.watermarks = new_marks
     
-    # 累積歷史資料邏輯
+    # 累積歷史資料 (SQLite 批次 upsert，link 唯一)；預設主題同時存成快照供下一位使用者直接讀取
+    # 有來源失敗時不寫快照，以免不完整的結果在 SNAPSHOT_MAX_AGE 內取代完整的舊快照
     try:
-        existing_data = {"news_list": []}
-        if os.path.exists('news_data.json'):
-            with open('news_data.json', 'r', encoding='utf-8') as f:
-                try:
-                    existing_data = json.load(f)
-                except json.JSONDecodeError:
-                    pass # 檔案損毀則使用空列表
-        
-        # 建立現有連結集合以過濾重複
-        existing_list = existing_data.get('news_list', [])
-        existing_links = set(item['link'] for item in existing_list)
-        
-        # Insert new items
-        for item in news_items_for_json:
-            if item['link'] not in existing_links:
-                existing_list.insert(0, item) # 新的放前面
-                existing_links.add(item['link'])
-        
-        # Optimization: Limit to latest 1000 items
-        if len(existing_list) > 1000:
-            existing_list = existing_list[:1000]
-        
-        existing_data['news_list'] = existing_list
-        existing_data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        with open('news_data.json', 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=4)
-            
+        NEWS_STORE.save_items(news_items_for_json, aliases)
+        if watermark_scope and new_marks:
+            NEWS_STORE.update_watermarks(watermark_scope, new_marks)
+        if search_mode != "custom" and token_budget is None and not delta and not diag.failures:
+            NEWS_STORE.put_snapshot(search_mode, "", days_int, output_text, news_items_for_json)
+            NEWS_STORE.update_watermarks(_snapshot_scope(search_mode, days_int), new_marks)
     except Exception as e:
-        print(f"存檔失敗: {e}")
+        print(f"存檔失敗: {e}", file=sys.stderr)
 
-    status_text.text("✅ 完成！")
-    time.sleep(0.5)
-    status_text.empty()
-    progress_bar.empty()
-    
-    return output_text, news_items_for_json
\ No newline at end of file
+    diag.duration_ms = (time.perf_counter() - started) * 1000
+    return output_text, news_items_for_json
+
+def _result_size(result: Tuple[str, List[NewsEntry], ScanDiagnostics]) -> int:
+    """粗估結果佔用的記憶體 (bytes)"""
+    prompt, items, _ = result
+    return sys.getsizeof(prompt) + sum(
+        sys.getsizeof(item) + sum(sys.getsizeof(getattr(item, name)) for name in NewsEntry.__slots__)
+        for item in items
+    )
+
+# 有來源失敗的結果只共用給同時等待者，不保留，下一次請求會重新抓取
+RESULT_CACHE = ResultCache(ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_MAX_ENTRIES,
+                           max_bytes=RESULT_CACHE_MAX_BYTES, sizeof=_result_size,
+                           cacheable=lambda result: not result[2].failures)
+
+def _snapshot_or_scan(days_label: str, days_int: int, search_mode: str, custom_keyword: Optional[str],
+                      token_budget: Optional[int], on_progress: Optional[Callable[[int, int], None]],
+                      use_snapshot: bool, watermark_scope: Optional[str], delta: bool,
+                      diagnostics: ScanDiagnostics,
+                      on_update: Optional[Callable[[ScanUpdate], None]]) -> Tuple[str, List[NewsEntry]]:
+    if use_snapshot and not delta and search_mode != "custom" and token_budget is None:
+        snapshot = NEWS_STORE.get_snapshot(search_mode, "", days_int, max_age=SNAPSHOT_MAX_AGE)
+        if snapshot:
+            diagnostics.mode, diagnostics.days, diagnostics.from_snapshot = search_mode, days_int, True
+            diagnostics.watermarks = {
+                key: (ts, sorted(ids))
+                for key, (ts, ids) in NEWS_STORE.get_watermarks(_snapshot_scope(search_mode, days_int)).items()
+            }
+            return snapshot
+
+    return run_scan(days_label, days_int, search_mode, custom_keyword, token_budget, on_progress=on_progress,
+                    watermark_scope=watermark_scope, delta=delta, diagnostics=diagnostics, on_update=on_update)
+
+def generate_chatgpt_prompt(days_label: str, days_int: int, search_mode: str, custom_keyword: Optional[str] = None,
+                            token_budget: Optional[int] = None,
+                            on_progress: Optional[Callable[[int, int], None]] = None,
+                            use_snapshot: bool = True, watermark_scope: Optional[str] = None,
+                            delta: bool = False,
+                            diagnostics: Optional[ScanDiagnostics] = None,
+                            on_update: Optional[Callable[[ScanUpdate], None]] = None) -> Tuple[str, List[NewsEntry]]:
+    """
+    執行爬蟲並生成 Prompt
+    預設主題優先讀取背景 worker 預先產生的快照 (見 worker.py)，不需等待即時抓取
+    相同條件的並行請求只執行一次 (RESULT_CACHE)，其他呼叫者等待並共用結果，
+    RESULT_CACHE_TTL 秒內的重複請求直接沿用；
+    快照與共用結果同樣帶有輸出項目的高水位標記，回傳前推進到呼叫者的 watermark_scope
+    :param on_progress: 進度回呼 (已完成數, 總數)；UI 層自行決定如何呈現；共用結果時不會被呼叫
+    :param use_snapshot: False 時一律即時抓取 (亦不使用結果快取)
+    :param watermark_scope / delta: 見 run_scan；delta 模式不使用快照與結果快取
+    :param diagnostics: 見 run_scan；讀取快照時只標記 from_snapshot，共用結果時標記 shared
+    :param on_update: 見 run_scan；讀取快照或共用結果時不會被呼叫，直接回傳最終結果
+    """
+    if delta or not use_snapshot:
+        return _snapshot_or_scan(days_label, days_int, search_mode, custom_keyword, token_budget, on_progress,
+                                 use_snapshot, watermark_scope, delta, diagnostics or ScanDiagnostics(), on_update)
+
+    def _compute() -> Tuple[str, List[NewsEntry], ScanDiagnostics]:
+        scan_diagnostics = ScanDiagnostics()
+        prompt, items = _snapshot_or_scan(days_label, days_int, search_mode, custom_keyword, token_budget,
+                                          on_progress, use_snapshot, None, delta, scan_diagnostics, on_update)
+        return prompt, items, scan_diagnostics
+
+    # 結果與 scope 無關，各 scope 共用同一份，標記在取得結果後各自推進
+    key = (search_mode, custom_keyword or "", days_int, token_budget)
+    (prompt, items, scan_diagnostics), status = RESULT_CACHE.get_or_compute(key, _compute)
+    if watermark_scope and scan_diagnostics.watermarks:
+        try:
+            NEWS_STORE.update_watermarks(watermark_scope, scan_diagnostics.watermarks)
+        except Exception as e:
+            print(f"存檔失敗: {e}", file=sys.stderr)
+    if diagnostics is not None:
+        diagnostics.copy_from(scan_diagnostics)
+        diagnostics.shared = "" if status == RESULT_MISS else status
+    return prompt, list(items)
+
+# ================= 3. CLI =================
+
+CLI_WATERMARK_SCOPE = "cli"
+
+def _days_label(days: int) -> str:
+    return next((k for k, v in DATE_MAP.items() if v == days), f"{days}天")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    python -m logic --mode vip --days 3               # 輸出 Prompt
+    python -m logic --mode custom --keyword Nickel --format json
+    python -m logic --mode macro --delta              # 只輸出上次執行後的新新聞
+    python -m logic --mode vip --fresh --diagnostics prometheus --diagnostics-file metrics.prom
+    """
+    parser = argparse.ArgumentParser(prog="python -m logic", description="抓取印尼新聞並生成 ChatGPT Prompt")
+    parser.add_argument("--mode", choices=["custom"] + list(TOPIC_MAP.values()), default="macro")
+    parser.add_argument("--keyword", help="custom 模式的關鍵字")
+    parser.add_argument("--days", type=int, default=3, help="時間範圍 (天)")
+    parser.add_argument("--format", choices=["prompt", "json"], default="prompt")
+    parser.add_argument("--budget", type=int, help=f"Prompt token 上限 (預設 {PROMPT_TOKEN_BUDGET})")
+    parser.add_argument("--fresh", action="store_true", help="忽略快照，一律即時抓取")
+    parser.add_argument("--delta", action="store_true", help="只輸出上次執行 (同一 --scope) 之後的新新聞")
+    parser.add_argument("--scope", default=CLI_WATERMARK_SCOPE, help="高水位標記的範圍名稱")
+    parser.add_argument("--diagnostics", choices=["json", "prometheus"], help="輸出每個來源的抓取診斷")
+    parser.add_argument("--diagnostics-file", help="診斷輸出檔 (預設 stderr)")
+    args = parser.parse_args(argv)
+
+    if args.mode == "custom" and not args.keyword:
+        parser.error("--mode custom 需要 --keyword")
+
+    def _progress(done: int, total: int) -> None:
+        print(f"\r📡 {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    diagnostics = ScanDiagnostics()
+    prompt, news_list = generate_chatgpt_prompt(
+        _days_label(args.days), args.days, args.mode, args.keyword, args.budget,
+        on_progress=_progress, use_snapshot=not args.fresh,
+        watermark_scope=args.scope, delta=args.delta, diagnostics=diagnostics,
+    )
+    print(file=sys.stderr)
+    for report in diagnostics.failures:
+        print(f"抓取失敗 [{report.name}]: {report.error}", file=sys.stderr)
+    if args.diagnostics:
+        text = diagnostics.to_json() + "\n" if args.diagnostics == "json" else diagnostics.to_prometheus()
+        if args.diagnostics_file:
+            with open(args.diagnostics_file, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            sys.stderr.write(text)
+
+    if args.format == "json":
+        json.dump({"prompt": prompt, "news_list": [item.to_dict() for item in news_list]}, sys.stdout,
+                  ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(prompt)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
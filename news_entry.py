@@ -0,0 +1,72 @@
+"""
+新聞項目
+
+抓取、資料庫、Prompt 與 UI 共用的精簡記錄 (__slots__，不帶 per-instance dict)。
+發布時間以 UTC epoch 秒儲存，顯示用的 RFC 2822 字串需要時才產生；
+JSON (快照、封存、CLI 輸出) 以 to_dict / from_dict 轉換。
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+# ================= 1. Helper Functions =================
+
+def parse_date(date_str: str) -> Optional[int]:
+    """RSS 日期字串轉 UTC epoch；無法解析時回傳 None"""
+    if not date_str:
+        return None
+    try:
+        return int(parsedate_to_datetime(date_str).timestamp())
+    except Exception:
+        return None
+
+# ================= 2. Record =================
+
+class NewsEntry:
+    """
+    :param ts: 發布時間 (UTC epoch 秒)；未知為 None
+    :param category: 來源段落名稱
+    :param tags: 公司 / 主題標籤 (見 tagger.py)
+    :param covered_by: 報導的媒體數 (近似重複分群後)
+    """
+    __slots__ = ("title", "link", "ts", "source", "category", "tags", "covered_by")
+
+    def __init__(self, title: str, link: str, ts: Optional[int] = None, source: str = "",
+                 category: str = "", tags: Optional[List[str]] = None, covered_by: int = 1):
+        self.title = title
+        self.link = link
+        self.ts = ts
+        self.source = source
+        self.category = category
+        self.tags = tags if tags is not None else []
+        self.covered_by = covered_by
+
+    @property
+    def date(self) -> str:
+        """顯示用日期 (RFC 2822, GMT)"""
+        return formatdate(self.ts, usegmt=True) if self.ts is not None else ""
+
+    def copy(self) -> "NewsEntry":
+        return NewsEntry(self.title, self.link, self.ts, self.source, self.category, list(self.tags), self.covered_by)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title, "link": self.link, "date": self.date, "published_ts": self.ts,
+            "source": self.source, "category": self.category, "covered_by": self.covered_by, "tags": self.tags,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NewsEntry":
+        """也接受舊格式 (只有 date 字串、沒有 published_ts)"""
+        ts = data.get("published_ts")
+        if ts is None:
+            ts = parse_date(data.get("date", ""))
+        return cls(data["title"], data["link"], ts, data.get("source", ""), data.get("category", ""),
+                   list(data.get("tags") or []), data.get("covered_by", 1))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, NewsEntry):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"NewsEntry({self.title!r}, {self.link!r}, ts={self.ts})"
@@ -0,0 +1,179 @@
+"""
+Prompt 組裝器 (含 token 預算)
+
+- 各段落先收集成 list，最後一次 join，避免字串反覆 += 的二次方複製
+- 以字元類型估算 token 數 (中日韓字 ≈ 1 token，其餘約 4 字元 1 token)
+- 超出預算時依「新近程度 + 關鍵字命中 + 來源 / 段落多樣性」排序取捨，並回報被省略的項目
+- 每個段落至少保留排序最前的一則；整段都放不下時仍輸出段落標題與省略說明
+"""
+import heapq
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from news_entry import NewsEntry
+
+# ================= 1. Constants =================
+
+DEFAULT_TOKEN_BUDGET: int = 12000
+
+# 排序權重
+RECENCY_WEIGHT: float = 1.0
+KEYWORD_WEIGHT: float = 1.0
+DIVERSITY_PENALTY: float = 0.3   # 同一媒體每多選一則扣分
+SECTION_PENALTY: float = 0.1     # 同一段落每多選一則扣分 (避免新近程度讓較舊的段落整段被擠掉)
+
+_CJK_RE = re.compile("[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+EMPTY_SECTION = "(無相關新聞)"
+FAILED_SECTION = "(來源抓取失敗: {error})"
+DROPPED_NOTE = "\n(因長度限制，另有 {count} 則較舊或重複來源的新聞未列入)\n"
+SECTION_DROPPED = "(因長度限制，本段 {count} 則新聞未列入)"
+
+# ================= 2. Helper Functions =================
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 數：CJK 字元各算 1，其餘字元每 4 個算 1"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def format_item(item: NewsEntry) -> str:
+    covered = f" (共 {item.covered_by} 家媒體報導)" if item.covered_by > 1 else ""
+    tags = f" [標籤: {', '.join(item.tags)}]" if item.tags else ""
+    return f"- [{item.date}] [{item.source}] {item.title}{covered}{tags}\n  連結: {item.link}\n"
+
+def format_section_header(name: str) -> str:
+    return f"\n## 【{name}】\n"
+
+# ================= 3. Builder =================
+
+@dataclass
+class PromptResult:
+    text: str
+    tokens: int
+    included: List[NewsEntry] = field(default_factory=list)
+    dropped: List[NewsEntry] = field(default_factory=list)
+
+
+class PromptBuilder:
+    """
+    :param header: 開頭指令 (必定保留)
+    :param footer: 結尾 (必定保留)
+    :param budget: token 上限；None 表示不限
+    :param keywords: 命中越多排序越前面
+    :param window_days: 新近程度的計算區間 (天)
+    """
+
+    def __init__(self, header: str, footer: str, budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+                 keywords: Sequence[str] = (), window_days: int = 7):
+        self.header = header
+        self.footer = footer
+        self.budget = budget
+        self.keywords = [k.lower() for k in keywords if k]
+        self.window = max(window_days, 1) * 86400
+        self._sections: List[Tuple[str, List[NewsEntry], Optional[str]]] = []
+
+    def add_section(self, name: str, items: List[NewsEntry], error: Optional[str] = None) -> None:
+        """
+        段落依加入順序輸出；items 為空時輸出「無相關新聞」
+        :param error: 來源抓取失敗的原因，items 為空時改為輸出失敗訊息 (與真的沒有新聞區分)
+        """
+        self._sections.append((name, items, error))
+
+    @staticmethod
+    def _empty_text(error: Optional[str]) -> str:
+        return FAILED_SECTION.format(error=error) if error else EMPTY_SECTION
+
+    # ---------- 排序 ----------
+
+    def _base_score(self, item: NewsEntry, now: float) -> float:
+        score = 0.0
+        if item.ts is not None:
+            score += RECENCY_WEIGHT * max(0.0, 1.0 - (now - item.ts) / self.window)
+        if self.keywords:
+            title = item.title.lower()
+            hits = sum(1 for k in self.keywords if k in title)
+            score += KEYWORD_WEIGHT * hits / len(self.keywords)
+        return score
+
+    def _ranked(self) -> List[Tuple[int, int]]:
+        """
+        Lazy greedy：同媒體 / 同段落的扣分只會增加，彈出時重算分數，
+        仍不低於次高者才接受，整體 O(n log n)
+        每個段落排序最前的一則提到最前面，預算內各段至少有一則
+        :return: 依優先順序排列的 (段落索引, 項目索引)
+        """
+        now = time.time()
+        heap = []
+        for s_idx, (_, items, _) in enumerate(self._sections):
+            for i_idx, item in enumerate(items):
+                base = self._base_score(item, now)
+                heap.append((-base, s_idx, i_idx, base, 0.0))
+        heapq.heapify(heap)
+
+        picked_per_source: Dict[str, int] = {}
+        picked_per_section: Dict[int, int] = {}
+        leaders: List[Tuple[int, int]] = []
+        order: List[Tuple[int, int]] = []
+        while heap:
+            _, s_idx, i_idx, base, seen = heapq.heappop(heap)
+            source = self._sections[s_idx][1][i_idx].source
+            penalty = (DIVERSITY_PENALTY * picked_per_source.get(source, 0)
+                       + SECTION_PENALTY * picked_per_section.get(s_idx, 0))
+            if penalty != seen:
+                heapq.heappush(heap, (-(base - penalty), s_idx, i_idx, base, penalty))
+                continue
+            picked_per_source[source] = picked_per_source.get(source, 0) + 1
+            picked_per_section[s_idx] = picked_per_section.get(s_idx, 0) + 1
+            (leaders if picked_per_section[s_idx] == 1 else order).append((s_idx, i_idx))
+        return leaders + order
+
+    # ---------- 組裝 ----------
+
+    def build(self) -> PromptResult:
+        # 省略說明與各段落標題 (整段省略時另加說明) 的長度先預留，段落標題一律輸出
+        fixed = estimate_tokens(self.header + self.footer + DROPPED_NOTE.format(count=99999))
+        lines: Dict[Tuple[int, int], str] = {}
+        for name, items, error in self._sections:
+            body = SECTION_DROPPED.format(count=len(items)) if items else self._empty_text(error)
+            fixed += estimate_tokens(format_section_header(name) + body + "\n")
+
+        keep = set()
+        used = fixed
+        if self.budget is None:
+            keep = {(s, i) for s, (_, items, _) in enumerate(self._sections) for i in range(len(items))}
+        else:
+            for s_idx, i_idx in self._ranked():
+                line = lines[(s_idx, i_idx)] = format_item(self._sections[s_idx][1][i_idx])
+                cost = estimate_tokens(line)
+                if used + cost > self.budget:
+                    continue  # 跳過較長的項目，仍嘗試放入後面較短的
+                used += cost
+                keep.add((s_idx, i_idx))
+
+        parts: List[str] = [self.header]
+        included: List[NewsEntry] = []
+        dropped: List[NewsEntry] = []
+        for s_idx, (name, items, error) in enumerate(self._sections):
+            if not items:
+                parts.append(format_section_header(name) + self._empty_text(error) + "\n")
+                continue
+            section_parts = []
+            for i_idx, item in enumerate(items):
+                if (s_idx, i_idx) in keep:
+                    section_parts.append(lines.get((s_idx, i_idx)) or format_item(item))
+                    included.append(item)
+                else:
+                    dropped.append(item)
+            parts.append(format_section_header(name))
+            if section_parts:
+                parts.extend(section_parts)
+            else:
+                parts.append(SECTION_DROPPED.format(count=len(items)) + "\n")
+
+        if dropped:
+            parts.append(DROPPED_NOTE.format(count=len(dropped)))
+        parts.append(self.footer)
+        text = "".join(parts)
+        return PromptResult(text, estimate_tokens(text), included, dropped)
@@ -0,0 +1,53 @@
+"""
+多公司查詢的分片規劃
+
+Google News 單一 RSS 回應最多約 100 則，把所有公司塞進同一個 OR 查詢時，
+報導量大的公司 (例如鴻海) 會擠掉其他公司。這裡把 OR 清單切成數個分片平行查詢：
+- plan_shards: 依分片大小平均切分
+- split_shard: 某分片的結果接近上限時再對半切，讓每家公司都有機會出現；
+  分片內每家公司都已有命中時不再切分 (總請求數上限由呼叫端控制)
+"""
+import urllib.parse
+from typing import Collection, List, Sequence
+
+# ================= 1. Constants =================
+
+DEFAULT_SHARD_SIZE: int = 4     # 每個分片的公司數
+RESULT_CAP: int = 100           # Google News 單一查詢的回傳上限
+SPLIT_THRESHOLD: int = 90       # 分片結果達此數量視為被截斷，需再切分
+
+# ================= 2. Planning =================
+
+def plan_shards(terms: Sequence[str], shard_size: int = DEFAULT_SHARD_SIZE) -> List[List[str]]:
+    """依 shard_size 切成數個分片，各分片大小盡量平均 (例如 13 個切成 4/3/3/3)"""
+    terms = list(terms)
+    if not terms:
+        return []
+    count = -(-len(terms) // max(shard_size, 1))
+    base, extra = divmod(len(terms), count)
+    shards, start = [], 0
+    for i in range(count):
+        end = start + base + (1 if i < extra else 0)
+        shards.append(terms[start:end])
+        start = end
+    return shards
+
+def split_shard(terms: Sequence[str]) -> List[List[str]]:
+    """對半切分；單一公司無法再切時回傳空 list"""
+    if len(terms) < 2:
+        return []
+    mid = (len(terms) + 1) // 2
+    return [list(terms[:mid]), list(terms[mid:])]
+
+def needs_split(terms: Sequence[str], result_count: int, covered: Collection[str] = ()) -> bool:
+    """:param covered: 結果中已有命中的公司 (terms 的子集)；全部命中時切分也不會多出新公司"""
+    if len(terms) < 2 or result_count < SPLIT_THRESHOLD:
+        return False
+    return any(term not in covered for term in terms)
+
+def or_query(terms: Sequence[str]) -> str:
+    """URL 編碼的 (A OR B OR C)；Google News 以 %20 表示空白"""
+    return "(" + "%20OR%20".join(urllib.parse.quote(t) for t in terms) + ")"
+
+def shard_label(terms: Sequence[str]) -> str:
+    return "|".join(t.strip('"') for t in terms)
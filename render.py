@@ -0,0 +1,47 @@
+"""
+新聞卡片 HTML 產生器
+
+整頁卡片組成單一 HTML 區塊，一次 st.markdown 送出，
+避免每則新聞各自成為一個前端元素。
+"""
+import html
+from typing import Iterable
+
+from news_entry import NewsEntry
+
+# 每頁卡片數
+PAGE_SIZE: int = 50
+
+CARD_TEMPLATE = (
+    '<div class="news-card">'
+    '<a href="{link}" target="_blank" class="news-title">{title}</a>'
+    '<div class="news-meta">{date} • {source} <span class="news-tag">{tag}</span>{covered}{tags}</div>'
+    '</div>'
+)
+
+def _safe_link(link: str) -> str:
+    """只允許 http(s) 連結"""
+    return html.escape(link, quote=True) if link.startswith(('http://', 'https://')) else '#'
+
+def _covered_tag(news: NewsEntry) -> str:
+    count = news.covered_by
+    return f'<span class="news-tag">{int(count)} 家報導</span>' if count > 1 else ''
+
+def _tags(news: NewsEntry) -> str:
+    return "".join(f'<span class="news-tag">{html.escape(c)}</span>' for c in news.tags)
+
+def render_card(news: NewsEntry, default_tag: str = "一般") -> str:
+    # Security fix: Escape HTML special characters
+    return CARD_TEMPLATE.format(
+        link=_safe_link(news.link),
+        title=html.escape(news.title),
+        date=html.escape(news.date),
+        source=html.escape(news.source),
+        tag=html.escape(news.category or default_tag),
+        covered=_covered_tag(news),
+        tags=_tags(news),
+    )
+
+def render_cards(news_list: Iterable[NewsEntry], default_tag: str = "一般") -> str:
+    """多則卡片組成單一 HTML 區塊"""
+    return "".join(render_card(news, default_tag) for news in news_list)
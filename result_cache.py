@@ -0,0 +1,128 @@
+"""
+程序內共用的結果快取 (single-flight)
+
+- 同一個 key 同時只會有一個計算在執行，其他呼叫者等待並取得同一份結果
+- 結果保留 ttl 秒，以 LRU 淘汰；筆數與總大小 (由 sizeof 估算) 皆有上限
+- 計算失敗不快取，例外傳給所有等待者；計算被中斷 (例如 Streamlit rerun 的 BaseException)
+  時等待者改由自己重新計算
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# ================= 1. Constants =================
+
+DEFAULT_TTL: float = 120.0
+DEFAULT_MAX_ENTRIES: int = 64
+DEFAULT_MAX_BYTES: int = 32 * 1024 * 1024
+
+# 取得結果的方式
+HIT = "hit"              # 快取內仍有效的結果
+COALESCED = "coalesced"  # 等待同時進行中的計算
+MISS = "miss"            # 由本次呼叫計算
+
+
+class _Abandoned(Exception):
+    """領頭的計算被中斷，等待者需自行重試"""
+
+# ================= 2. Cache =================
+
+class ResultCache:
+    """
+    :param ttl: 結果有效秒數
+    :param max_entries: 筆數上限
+    :param max_bytes: 總大小上限 (sizeof 的估算值)
+    :param sizeof: 估算單筆結果大小；未提供時每筆算 1
+    :param cacheable: 結果是否保留 (例如部分來源失敗時只共用給同時等待者，不保留)
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, sizeof: Optional[Callable[[Any], int]] = None,
+                 cacheable: Optional[Callable[[Any], bool]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 1)
+        self.cacheable = cacheable or (lambda value: True)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()  # key -> (到期時間, 大小, 值)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._bytes = 0
+        self.stats: Dict[str, int] = {HIT: 0, COALESCED: 0, MISS: 0, "evicted": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, str]:
+        """:return: (結果, HIT / COALESCED / MISS)"""
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats[HIT] += 1
+                    return entry[2], HIT
+                if entry:
+                    self._discard(key)
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                    self.stats[MISS] += 1
+                else:
+                    self.stats[COALESCED] += 1
+
+            if not leader:
+                try:
+                    return future.result(), COALESCED
+                except _Abandoned:
+                    continue
+
+            try:
+                value = compute()
+            except Exception as e:
+                self._finish(key, future)
+                future.set_exception(e)
+                raise
+            except BaseException:
+                self._finish(key, future)
+                future.set_exception(_Abandoned())
+                raise
+            self._finish(key, future, value)
+            future.set_result(value)
+            return value, MISS
+
+    def _finish(self, key: Hashable, future: Future, value: Any = None) -> None:
+        """移出進行中清單；成功時存入快取並依上限淘汰"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if value is not None and self.cacheable(value):
+                size = self.sizeof(value)
+                if size <= self.max_bytes:
+                    self._discard(key)
+                    self._entries[key] = (time.monotonic() + self.ttl, size, value)
+                    self._bytes += size
+                    self._evict()
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats["evicted"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """清除單一 key 或全部結果 (不影響進行中的計算)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._discard(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,123 @@
+"""
+歷史庫全文檢索 (SQLite FTS5)
+
+- 中文 (CJK) 以相鄰兩字 bigram 切詞，英文/數字以單字切詞
+- 切好的詞以空白串接後寫入 FTS5，查詢時以相同規則切詞，
+  中文詞自然成為 bigram 片語 (phrase) 查詢
+- 文件末尾另附中文單字 (unigram)，單字查詢 (如「鎳」) 可命中任何位置，不只 bigram 開頭
+- 查詢語法：空白 = AND，OR (或 |) 分隔多組條件，"..." 為片語
+  例：印尼 電動車 OR "nickel smelter" = (印尼 AND 電動車) OR "nickel smelter"
+"""
+import re
+import sqlite3
+import unicodedata
+from typing import Iterable, List, Optional, Sequence
+
+# ================= 1. Constants =================
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+    title, source, category,
+    tokenize = 'unicode61'
+);
+"""
+
+# bm25 欄位權重：標題 > 來源 > 分類
+BM25_WEIGHTS = (10.0, 2.0, 1.0)
+
+# 文件切詞規則版本；變更 to_document 時遞增，既有索引於開啟時重建
+INDEX_VERSION = "2"
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[a-z0-9]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+_OR_WORDS = {"OR", "|"}
+
+# ================= 2. Tokenizer =================
+
+def _normalize(text: str) -> str:
+    """NFKC 正規化 (全形轉半形) 並轉小寫"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+def tokenize(text: str) -> List[str]:
+    """中文 bigram + 英文單字切詞"""
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall(_normalize(text)):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+def to_document(text: str) -> str:
+    """
+    寫入 FTS 的欄位內容：切詞結果之後附上不重複的中文單字
+    單字接在全部 bigram 之後，不會打斷 bigram 片語的相鄰關係
+    """
+    unigrams = dict.fromkeys(_CJK_RE.findall(_normalize(text)))
+    return " ".join([*tokenize(text), *unigrams])
+
+# ================= 3. Query Parser =================
+
+def _term_to_fts(term: str, phrase: bool) -> Optional[str]:
+    tokens = tokenize(term)
+    if not tokens:
+        return None
+    if len(tokens) == 1 and not phrase:
+        token = tokens[0]
+        # 英文以前綴比對，輸入到一半也能命中；中文單字直接比對文件中的 unigram
+        if not _CJK_RE.match(token):
+            return f'"{token}"*'
+        return f'"{token}"'
+    return '"' + " ".join(tokens) + '"'
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    將使用者查詢轉為 FTS5 MATCH 運算式
+    切詞後只會剩下中英文字元，使用者輸入無法注入 FTS 語法
+    """
+    groups: List[List[str]] = [[]]
+    for phrase, word in _QUERY_RE.findall(query or ""):
+        if word in _OR_WORDS:
+            groups.append([])
+            continue
+        expr = _term_to_fts(phrase or word, phrase=bool(phrase))
+        if expr:
+            groups[-1].append(expr)
+
+    alternatives = ["(" + " AND ".join(g) + ")" for g in groups if g]
+    if not alternatives:
+        return None
+    return " OR ".join(alternatives)
+
+# ================= 4. Index Maintenance =================
+
+def ensure_index(conn: sqlite3.Connection) -> None:
+    """建立 FTS 表；舊資料庫尚未建立索引或切詞規則版本不同時一次重建 (需有 meta 表)"""
+    conn.executescript(FTS_SCHEMA)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'fts_version'").fetchone()
+    if row and row[0] == INDEX_VERSION:
+        return
+    conn.execute("DELETE FROM news_fts")
+    rows = conn.execute("SELECT id, title, source, category FROM news")
+    conn.executemany(
+        "INSERT INTO news_fts (rowid, title, source, category) VALUES (?, ?, ?, ?)",
+        ((r[0], to_document(r[1]), to_document(r[2]), to_document(r[3])) for r in rows),
+    )
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('fts_version', ?)", (INDEX_VERSION,))
+
+def index_rows(conn: sqlite3.Connection, rows: Iterable[Sequence]) -> None:
+    """以 news.id 為 rowid 寫入 / 覆蓋索引 (rows: id, title, source, category)"""
+    rows = list(rows)
+    conn.executemany("DELETE FROM news_fts WHERE rowid = ?", ((r[0],) for r in rows))
+    conn.executemany(
+        "INSERT INTO news_fts (rowid, title, source, category) VALUES (?, ?, ?, ?)",
+        ((r[0], to_document(r[1]), to_document(r[2]), to_document(r[3])) for r in rows),
+    )
+
+def remove_rows(conn: sqlite3.Connection, ids: Iterable[int]) -> None:
+    conn.executemany("DELETE FROM news_fts WHERE rowid = ?", ((i,) for i in ids))
@@ -0,0 +1,580 @@
+"""
+歷史新聞資料庫 (SQLite, WAL 模式)
+
+- link 唯一索引，批次 upsert，不再整檔讀寫 news_data.json
+- published_ts / category 索引，支援依日期與分類快速查詢
+- WAL + busy_timeout，多個 Streamlit session 同時寫入不會互相覆蓋
+- 首次開啟時自動匯入舊版 news_data.json
+- 寫入時同步更新 FTS5 全文索引 (見 search.py)
+- snapshots 表存放背景 worker 預先產生的結果，UI 直接讀取
+- 新連結先以 MinHash LSH 比對近似重複標題 (見 dedupe.py)，重複者只記為別名；
+  covered_by 為代表與全部別名的不同媒體數，同一則重複寫入不會累加
+- 公司 / 主題標籤 (見 tagger.py) 存於 news.tags 並展開至 news_tags 表，供篩選與統計
+- 新增的項目同時附加至月份封存 (見 archive.py)；設定 retention_days 時，
+  資料庫只保留近期新聞，較舊的只存在封存中
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import dedupe
+import search
+from archive import Archive
+from news_entry import NewsEntry
+from tagger import Tagger
+
+# ================= 1. Constants =================
+
+DEFAULT_DB_PATH: str = "news.db"
+LEGACY_JSON_PATH: str = "news_data.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    id           INTEGER PRIMARY KEY,
+    link         TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    date         TEXT NOT NULL DEFAULT '',   -- RSS 原始日期字串 (顯示用)
+    published_ts INTEGER,                    -- UTC epoch 秒 (排序 / 篩選用)
+    source       TEXT NOT NULL DEFAULT '',
+    category     TEXT NOT NULL DEFAULT '',
+    fetched_at   INTEGER NOT NULL,
+    covered_by   INTEGER NOT NULL DEFAULT 1, -- 報導的媒體數 (含近似重複)
+    tags         TEXT NOT NULL DEFAULT '[]'  -- 公司 / 主題標籤 (JSON list)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_news_link ON news(link);
+CREATE INDEX IF NOT EXISTS idx_news_published ON news(published_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_news_category ON news(category, published_ts DESC);
+CREATE INDEX IF NOT EXISTS idx_news_source ON news(source);
+CREATE TABLE IF NOT EXISTS news_lsh (          -- MinHash LSH band -> news.id
+    band    INTEGER NOT NULL,
+    news_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_news_lsh_band ON news_lsh(band);
+CREATE TABLE IF NOT EXISTS news_alias (        -- 近似重複的連結 -> 代表 news.id
+    link    TEXT PRIMARY KEY,
+    news_id INTEGER NOT NULL,
+    source  TEXT NOT NULL DEFAULT ''           -- 別名的媒體 (計算 covered_by)
+);
+CREATE TABLE IF NOT EXISTS news_tags (         -- 標籤 -> news.id (news.tags 的展開)
+    tag     TEXT NOT NULL,
+    news_id INTEGER NOT NULL,
+    kind    TEXT NOT NULL DEFAULT '',          -- company / keyword
+    PRIMARY KEY (tag, news_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_news_tags_news ON news_tags(news_id);
+CREATE TABLE IF NOT EXISTS snapshots (         -- 預先產生的 Prompt 與新聞列表
+    mode       TEXT NOT NULL,
+    keyword    TEXT NOT NULL DEFAULT '',
+    days       INTEGER NOT NULL,
+    prompt     TEXT NOT NULL,
+    items      TEXT NOT NULL,                  -- JSON
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (mode, keyword, days)
+);
+CREATE TABLE IF NOT EXISTS watermarks (        -- 每個來源已處理到的最新發布時間
+    scope      TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    last_ts    INTEGER NOT NULL,
+    last_ids   TEXT NOT NULL,                  -- JSON：發布時間等於 last_ts 的 entry id
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (scope, source_key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO news (link, title, date, published_ts, source, category, fetched_at, covered_by, tags)
+VALUES (:link, :title, :date, :published_ts, :source, :category, :fetched_at, :covered_by, :tags)
+ON CONFLICT(link) DO UPDATE SET
+    title = excluded.title,
+    date = excluded.date,
+    published_ts = COALESCE(excluded.published_ts, news.published_ts),
+    source = excluded.source,
+    covered_by = MAX(news.covered_by, excluded.covered_by),
+    tags = CASE WHEN excluded.tags = '[]' THEN news.tags ELSE excluded.tags END
+"""
+
+COLUMNS = "title, link, date, published_ts, source, category, covered_by, tags"
+
+# 舊版資料庫缺少的欄位 (表, 欄位名, 定義)
+MIGRATIONS = (
+    ("news", "covered_by", "INTEGER NOT NULL DEFAULT 1"),
+    ("news", "tags", "TEXT NOT NULL DEFAULT '[]'"),         # JSON list
+    ("news_alias", "source", "TEXT NOT NULL DEFAULT ''"),
+)
+
+# 代表項目的 covered_by：不小於原值，且不小於代表與別名的不同媒體數
+_COVERED_BY_SQL = """
+UPDATE news SET covered_by = MAX(covered_by, (
+    SELECT COUNT(DISTINCT s) FROM (
+        SELECT source AS s FROM news WHERE id = :id
+        UNION SELECT source FROM news_alias WHERE news_id = :id AND source != ''
+    )
+)) WHERE id = :id
+"""
+
+# 近似重複比對時每則最多檢查的候選數
+_MAX_CANDIDATES = 200
+
+# 近似重複只在發布時間相差此天數內成立，避免舊新聞把日後同標題的新報導吞掉
+NEAR_DUP_WINDOW_DAYS = 3
+
+# 篩選欄位白名單 (facet)
+FACET_COLUMNS = ("category", "source")
+
+# SQLite 單一語句參數上限保守值
+_CHUNK = 500
+
+# ================= 2. Helper Functions =================
+
+def _row_to_item(row: sqlite3.Row) -> NewsEntry:
+    return NewsEntry(row["title"], row["link"], row["published_ts"], row["source"], row["category"],
+                     json.loads(row["tags"]), row["covered_by"])
+
+# ================= 3. Store =================
+
+class NewsStore:
+    """
+    SQLite 歷史新聞庫
+    每個執行緒各自持有連線 (Streamlit 每個 session 執行於不同執行緒)
+    :param tagger: 標籤器；寫入時替沒有 tags 的項目標記，字典變更時重新標記全部資料
+    :param archive: 月份封存；首次啟用時將既有資料一次寫入
+    :param retention_days: 資料庫保留的天數 (依發布時間)，None 為全部保留；需搭配 archive
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, legacy_json: Optional[str] = LEGACY_JSON_PATH,
+                 tagger: Optional[Tagger] = None, archive: Optional[Archive] = None,
+                 retention_days: Optional[int] = None):
+        if retention_days is not None and archive is None:
+            raise ValueError("retention_days requires an archive")
+        self.path = path
+        self.legacy_json = legacy_json
+        self.tagger = tagger
+        self.archive = archive
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+            self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.executescript(SCHEMA)
+            with conn:
+                self._migrate(conn)
+                search.ensure_index(conn)
+                self._ensure_lsh(conn)
+                self._ensure_tags(conn)
+                self._ensure_archive(conn)
+            self._import_legacy(conn)
+            self._initialized = True
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        columns: Dict[str, Set[str]] = {}
+        for table, name, definition in MIGRATIONS:
+            if table not in columns:
+                columns[table] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if name not in columns[table]:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def _ensure_lsh(self, conn: sqlite3.Connection) -> None:
+        """舊資料庫尚未建立 LSH band 時一次補齊"""
+        if conn.execute("SELECT 1 FROM news_lsh LIMIT 1").fetchone():
+            return
+        rows = conn.execute("SELECT id, title FROM news").fetchall()
+        conn.executemany("INSERT INTO news_lsh (band, news_id) VALUES (?, ?)", (
+            (band, row[0]) for row in rows for band in dedupe.band_keys(dedupe.fingerprint(row[1]))
+        ))
+
+    def _ensure_tags(self, conn: sqlite3.Connection) -> None:
+        """
+        字典與上次標記時不同 (或舊資料庫尚未標記) 時，以標題重新標記全部資料
+        新標籤併入既有標籤而非取代：單一公司分片判定的公司、別名併入的標籤都只存在資料庫中，
+        無法由標題重新推得
+        """
+        if self.tagger is None:
+            return
+        row = conn.execute("SELECT value FROM meta WHERE key = 'tagger'").fetchone()
+        if row and row[0] == self.tagger.signature:
+            return
+        conn.execute("DELETE FROM news_tags")
+        rows, changed = [], []
+        for news_id, title, current in conn.execute("SELECT id, title, tags FROM news").fetchall():
+            existing = json.loads(current)
+            tags = list(dict.fromkeys(existing + self.tagger.tag(title)))
+            rows.append((news_id, tags))
+            if len(tags) > len(existing):
+                changed.append((json.dumps(tags, ensure_ascii=False), news_id))
+        conn.executemany("UPDATE news SET tags = ? WHERE id = ?", changed)
+        self._index_tags(conn, rows)
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('tagger', ?)", (self.tagger.signature,))
+
+    def _ensure_archive(self, conn: sqlite3.Connection) -> None:
+        """首次啟用封存時，既有資料一次寫入封存 (之後由 _upsert 逐批附加)"""
+        if self.archive is None or conn.execute("SELECT 1 FROM meta WHERE key = 'archive_seeded'").fetchone():
+            return
+        last_id = 0
+        while True:
+            rows = conn.execute(f"SELECT id, {COLUMNS} FROM news WHERE id > ? ORDER BY id LIMIT 5000",
+                                (last_id,)).fetchall()
+            if not rows:
+                break
+            self.archive.append(_row_to_item(r).to_dict() for r in rows)
+            last_id = rows[-1]["id"]
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('archive_seeded', ?)", (str(int(time.time())),))
+
+    def _index_tags(self, conn: sqlite3.Connection, rows: Iterable[Tuple[int, List[str]]]) -> None:
+        """寫入 news_tags (rows: news.id, 標籤)"""
+        kind = self.tagger.kind if self.tagger else (lambda tag: None)
+        conn.executemany("INSERT OR IGNORE INTO news_tags (tag, news_id, kind) VALUES (?, ?, ?)", (
+            (tag, news_id, kind(tag) or "") for news_id, tags in rows for tag in tags
+        ))
+
+    def _import_legacy(self, conn: sqlite3.Connection) -> None:
+        """將舊版 news_data.json 匯入 (僅執行一次)"""
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            legacy = {}
+        # 舊檔新的在前，反轉後依序寫入以保留先後
+        items = [NewsEntry.from_dict(d) for d in reversed(legacy.get("news_list", [])) if d.get("link")]
+        with conn:
+            self._upsert(conn, items)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_imported', ?)", (str(len(items)),))
+            self._bump_version(conn)
+            if legacy.get("timestamp"):
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('timestamp', ?)", (legacy["timestamp"],))
+
+    # ---------- 寫入 ----------
+
+    def _upsert(self, conn: sqlite3.Connection, items: Iterable[NewsEntry],
+                aliases: Optional[Dict[str, List[NewsEntry]]] = None) -> None:
+        """
+        批次 upsert，並增量更新全文索引
+        - 已存在的連結：更新標題 / 日期等欄位
+        - 已記為別名的連結：略過
+        - 新連結：與既有標題近似重複者記為別名並更新代表項目的 covered_by，否則新增
+        - aliases {代表連結: 同群其他項目}：掃描時已分群的成員一併記為別名；
+          下次掃描改由其他成員當代表時，該連結已是別名，不會再被當成新的近似重複
+        """
+        now = int(time.time())
+        rows = [
+            {
+                "link": item.link, "title": item.title, "date": item.date, "published_ts": item.ts,
+                "source": item.source, "category": item.category,
+                "fetched_at": now, "covered_by": item.covered_by,
+                "tags": json.dumps(self._item_tags(item), ensure_ascii=False),
+            }
+            for item in items if item.link
+        ]
+        aliases = aliases or {}
+        member_links = [m.link for members in aliases.values() for m in members if m.link]
+        known = self._known_links(conn, [r["link"] for r in rows] + member_links)
+
+        existing = [r for r in rows if known.get(r["link"]) == "news"]
+        conn.executemany(UPSERT_SQL, existing)
+        touched_links = [r["link"] for r in existing]
+        inserted: List[Dict[str, Any]] = []
+
+        for row in rows:
+            if row["link"] in known:
+                continue
+            known[row["link"]] = "news"
+            fp = dedupe.fingerprint(row["title"])
+            dup_id = self._find_near_duplicate(conn, fp, row["published_ts"] or now)
+            if dup_id is not None:
+                self._add_alias(conn, dup_id, row["link"], row["source"])
+                self._merge_tags(conn, dup_id, json.loads(row["tags"]))
+                continue
+            news_id = conn.execute(UPSERT_SQL, row).lastrowid
+            conn.executemany("INSERT INTO news_lsh (band, news_id) VALUES (?, ?)",
+                             ((band, news_id) for band in dedupe.band_keys(fp)))
+            touched_links.append(row["link"])
+            inserted.append(row)
+
+        for link, members in aliases.items():
+            news_id = self._resolve_id(conn, link)
+            if news_id is None:
+                continue
+            for member in members:
+                if member.link and member.link not in known:
+                    known[member.link] = "news_alias"
+                    self._add_alias(conn, news_id, member.link, member.source)
+
+        # 封存先於交易提交：提交失敗時封存多一筆無妨，反之則可能在清除舊資料後遺失
+        if self.archive is not None and inserted:
+            self.archive.append({
+                "title": r["title"], "link": r["link"], "date": r["date"], "source": r["source"],
+                "category": r["category"], "covered_by": r["covered_by"], "tags": json.loads(r["tags"]),
+                "published_ts": r["published_ts"],
+            } for r in inserted)
+
+        for i in range(0, len(touched_links), _CHUNK):
+            chunk = touched_links[i:i + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, title, source, category, tags FROM news WHERE link IN ({placeholders})", chunk
+            ).fetchall()
+            search.index_rows(conn, rows)
+            conn.executemany("DELETE FROM news_tags WHERE news_id = ?", ((r[0],) for r in rows))
+            self._index_tags(conn, ((r[0], json.loads(r[4])) for r in rows))
+
+    def _add_alias(self, conn: sqlite3.Connection, news_id: int, link: str, source: str) -> None:
+        conn.execute("INSERT OR IGNORE INTO news_alias (link, news_id, source) VALUES (?, ?, ?)",
+                     (link, news_id, source))
+        conn.execute(_COVERED_BY_SQL, {"id": news_id})
+
+    def _resolve_id(self, conn: sqlite3.Connection, link: str) -> Optional[int]:
+        """連結對應的 news.id (本身為代表或為別名)"""
+        row = conn.execute("SELECT id FROM news WHERE link = ? "
+                           "UNION ALL SELECT news_id FROM news_alias WHERE link = ? LIMIT 1", (link, link)).fetchone()
+        return row[0] if row else None
+
+    def _item_tags(self, item: NewsEntry) -> List[str]:
+        if item.tags:
+            return list(item.tags)
+        return self.tagger.tag(item.title) if self.tagger else []
+
+    def _merge_tags(self, conn: sqlite3.Connection, news_id: int, tags: List[str]) -> None:
+        """近似重複的別名帶有的標籤併入代表項目"""
+        if not tags:
+            return
+        current = json.loads(conn.execute("SELECT tags FROM news WHERE id = ?", (news_id,)).fetchone()[0])
+        merged = list(dict.fromkeys(current + tags))
+        if len(merged) > len(current):
+            conn.execute("UPDATE news SET tags = ? WHERE id = ?", (json.dumps(merged, ensure_ascii=False), news_id))
+            self._index_tags(conn, [(news_id, merged)])
+
+    def _known_links(self, conn: sqlite3.Connection, links: List[str]) -> Dict[str, str]:
+        """:return: {link: "news" | "alias"}"""
+        known: Dict[str, str] = {}
+        for i in range(0, len(links), _CHUNK):
+            chunk = links[i:i + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for table in ("news", "news_alias"):
+                for row in conn.execute(f"SELECT link FROM {table} WHERE link IN ({placeholders})", chunk):
+                    known.setdefault(row[0], table)
+        return known
+
+    def _find_near_duplicate(self, conn: sqlite3.Connection, fp: Set[str], ts: int) -> Optional[int]:
+        """
+        :param ts: 新項目的發布時間 (無日期時以抓取時間代替)；
+                   只比對 NEAR_DUP_WINDOW_DAYS 內的候選，候選無發布時間時同樣以 fetched_at 比較
+        """
+        keys = dedupe.band_keys(fp)
+        if not keys:
+            return None
+        window = NEAR_DUP_WINDOW_DAYS * 86400
+        candidates = conn.execute(
+            f"SELECT DISTINCT n.id, n.title FROM news_lsh l JOIN news n ON n.id = l.news_id "
+            f"WHERE l.band IN ({','.join('?' * len(keys))}) "
+            f"AND COALESCE(n.published_ts, n.fetched_at) BETWEEN ? AND ? ORDER BY n.id DESC LIMIT ?",
+            (*keys, ts - window, ts + window, _MAX_CANDIDATES),
+        )
+        for news_id, title in candidates:
+            if dedupe.is_near_duplicate(fp, dedupe.fingerprint(title)):
+                return news_id
+        return None
+
+    def save_items(self, items: List[NewsEntry], aliases: Optional[Dict[str, List[NewsEntry]]] = None) -> None:
+        """
+        批次 upsert (單一交易)，並更新最後更新時間；設定 retention_days 時一併清除過期資料
+        :param aliases: {代表連結: 同群的其他項目}，記為代表的別名 (見 _upsert)
+        """
+        conn = self._conn()
+        with conn:
+            self._upsert(conn, items, aliases)
+            if self.retention_days is not None:
+                self._prune(conn, int(time.time()) - self.retention_days * 86400)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('timestamp', ?)",
+                         (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+            self._bump_version(conn)
+
+    def _prune(self, conn: sqlite3.Connection, before: int) -> int:
+        """刪除發布時間早於 before 的資料 (已存在於封存)；:return: 刪除筆數"""
+        ids = [r[0] for r in conn.execute("SELECT id FROM news WHERE published_ts < ?", (before,))]
+        for i in range(0, len(ids), _CHUNK):
+            chunk = ids[i:i + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for table, column in (("news_lsh", "news_id"), ("news_alias", "news_id"),
+                                  ("news_tags", "news_id"), ("news", "id")):
+                conn.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", chunk)
+            search.remove_rows(conn, chunk)
+        return len(ids)
+
+    def _bump_version(self, conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT INTO meta VALUES ('version', '1') "
+                     "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    # ---------- 快照 ----------
+
+    def put_snapshot(self, mode: str, keyword: str, days: int, prompt: str, items: List[NewsEntry]) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (mode, keyword, days, prompt, items, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (mode, keyword, days, prompt, json.dumps([i.to_dict() for i in items], ensure_ascii=False),
+                 int(time.time())),
+            )
+
+    def get_snapshot(self, mode: str, keyword: str, days: int,
+                     max_age: Optional[int] = None) -> Optional[Tuple[str, List[NewsEntry]]]:
+        """:return: (prompt, items)；不存在或超過 max_age 秒時回傳 None"""
+        row = self._conn().execute(
+            "SELECT prompt, items, created_at FROM snapshots WHERE mode = ? AND keyword = ? AND days = ?",
+            (mode, keyword, days),
+        ).fetchone()
+        if row is None or (max_age is not None and time.time() - row["created_at"] > max_age):
+            return None
+        return row["prompt"], [NewsEntry.from_dict(d) for d in json.loads(row["items"])]
+
+    # ---------- 高水位標記 ----------
+
+    def get_watermarks(self, scope: str, keys: Optional[List[str]] = None) -> Dict[str, Tuple[int, Set[str]]]:
+        """
+        :param keys: 只取這些來源；None 時取該 scope 的全部標記
+        :return: {source_key: (last_ts, 該時間點的 entry id)}
+        """
+        if keys is None:
+            rows = self._conn().execute(
+                "SELECT source_key, last_ts, last_ids FROM watermarks WHERE scope = ?", (scope,)
+            )
+            return {r["source_key"]: (r["last_ts"], set(json.loads(r["last_ids"]))) for r in rows}
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT source_key, last_ts, last_ids FROM watermarks WHERE scope = ? AND source_key IN ({placeholders})",
+            (scope, *keys),
+        )
+        return {r["source_key"]: (r["last_ts"], set(json.loads(r["last_ids"]))) for r in rows}
+
+    def update_watermarks(self, scope: str, marks: Dict[str, Tuple[int, List[str]]]) -> None:
+        """只往前推進：較新的時間取代舊值，相同時間則合併 entry id"""
+        conn = self._conn()
+        now = int(time.time())
+        with conn:
+            current = self.get_watermarks(scope, list(marks))
+            for key, (ts, ids) in marks.items():
+                old_ts, old_ids = current.get(key, (None, set()))
+                if old_ts is not None and ts < old_ts:
+                    continue
+                merged = set(ids) | old_ids if ts == old_ts else set(ids)
+                conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (scope, source_key, last_ts, last_ids, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (scope, key, ts, json.dumps(sorted(merged), ensure_ascii=False), now),
+                )
+
+    # ---------- 查詢 ----------
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+    def last_updated(self) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'timestamp'").fetchone()
+        return row[0] if row else None
+
+    def data_version(self) -> int:
+        """每次寫入遞增，可作為查詢結果 / 渲染快取的版本鍵"""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def recent(self, limit: int = 1000, offset: int = 0) -> List[NewsEntry]:
+        """依發布時間 (新到舊) 取出"""
+        rows = self._conn().execute(
+            f"SELECT {COLUMNS} FROM news ORDER BY published_ts DESC NULLS LAST, id DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [_row_to_item(r) for r in rows]
+
+    def search(self, query: str = "", categories: Sequence[str] = (), sources: Sequence[str] = (),
+               since: Optional[int] = None, until: Optional[int] = None, tags: Sequence[str] = (),
+               limit: int = 1000, offset: int = 0) -> List[NewsEntry]:
+        """
+        全文檢索 + 篩選
+        :param query: 查詢字串 (語法見 search.py)；空字串時只套用篩選，依時間排序
+        :param categories: 分類篩選 (任一符合)
+        :param sources: 來源篩選 (任一符合)
+        :param since: 發布時間下限 (UTC epoch, 含)
+        :param until: 發布時間上限 (UTC epoch, 不含)
+        :param tags: 標籤篩選 (任一符合)
+        :param limit / offset: 分頁
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        if categories:
+            where.append(f"n.category IN ({','.join('?' * len(categories))})")
+            params.extend(categories)
+        if sources:
+            where.append(f"n.source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if since is not None:
+            where.append("n.published_ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("n.published_ts < ?")
+            params.append(until)
+        if tags:
+            where.append(f"n.id IN (SELECT news_id FROM news_tags WHERE tag IN ({','.join('?' * len(tags))}))")
+            params.extend(tags)
+
+        columns = ", ".join(f"n.{c.strip()}" for c in COLUMNS.split(","))
+        match = search.build_match_query(query)
+        if match:
+            weights = ", ".join(str(w) for w in search.BM25_WEIGHTS)
+            sql = (f"SELECT {columns} FROM news_fts JOIN news n ON n.id = news_fts.rowid "
+                   f"WHERE news_fts MATCH ? {''.join(' AND ' + w for w in where)} "
+                   f"ORDER BY bm25(news_fts, {weights}), n.published_ts DESC LIMIT ? OFFSET ?")
+            params = [match] + params
+        elif query.strip():
+            return []  # 查詢字串切詞後為空 (例如只有標點)
+        else:
+            sql = (f"SELECT {columns} FROM news n {'WHERE ' + ' AND '.join(where) if where else ''} "
+                   "ORDER BY n.published_ts DESC NULLS LAST, n.id DESC LIMIT ? OFFSET ?")
+        params.extend((limit, offset))
+        return [_row_to_item(r) for r in self._conn().execute(sql, params)]
+
+    def facet_values(self, column: str, limit: int = 50) -> List[str]:
+        """篩選選項 (依筆數多寡排序)"""
+        if column not in FACET_COLUMNS:
+            raise ValueError(f"unsupported facet: {column}")
+        rows = self._conn().execute(
+            f"SELECT {column} FROM news WHERE {column} != '' GROUP BY {column} "
+            "ORDER BY COUNT(*) DESC LIMIT ?", (limit,),
+        )
+        return [r[0] for r in rows]
+
+    def tag_counts(self, kind: Optional[str] = None, limit: int = 50) -> List[Tuple[str, int]]:
+        """各標籤的新聞數 (多到少)；kind 為 company / keyword 時只取該類"""
+        rows = self._conn().execute(
+            f"SELECT tag, COUNT(*) FROM news_tags {'WHERE kind = ?' if kind else ''} "
+            "GROUP BY tag ORDER BY COUNT(*) DESC LIMIT ?", (*([kind] if kind else []), limit),
+        )
+        return [(r[0], r[1]) for r in rows]
@@ -0,0 +1,104 @@
+"""
+公司 / 主題標籤 (Aho-Corasick 多模式比對)
+
+- 字典格式 {kind: {標籤: [比對詞, ...]}}，例如 {"company": {"鴻海": ["鴻海", "Foxconn"]}}
+- 所有比對詞編譯成一個自動機，每個標題只掃描一次，
+  耗時與標題長度 (及命中數) 成正比，不隨字典大小增加
+- 不分大小寫；英數比對詞需落在單字邊界 (避免 "EV" 命中 "Seven")，中文不受此限
+"""
+import hashlib
+import json
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+# ================= 1. Helper Functions =================
+
+def _normalize(pattern: str) -> str:
+    """比對詞去掉查詢用的引號並轉小寫"""
+    return pattern.strip().strip('"').lower()
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+# ================= 2. Tagger =================
+
+class Tagger:
+    """
+    :param dictionary: {kind: {標籤: [比對詞, ...]}}；同一比對詞對應多個標籤時以先出現者為準
+    """
+
+    def __init__(self, dictionary: Dict[str, Dict[str, Sequence[str]]]):
+        self.dictionary = dictionary
+        self._kinds: Dict[str, str] = {}
+        # 自動機：節點以 index 表示；_goto[node][ch] -> node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]           # 節點結束的比對詞 (含 fail 鏈上的)
+        self._patterns: List[tuple] = []            # (長度, 標籤, 檢查開頭邊界, 檢查結尾邊界)
+
+        for kind, tags in dictionary.items():
+            for tag, patterns in tags.items():
+                self._kinds.setdefault(tag, kind)
+                for pattern in [tag, *patterns]:
+                    self._add(_normalize(pattern), tag)
+        self._build()
+
+    def _add(self, pattern: str, tag: str) -> None:
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        if not self._out[node]:
+            self._out[node].append(len(self._patterns))
+            self._patterns.append((len(pattern), tag, _is_word_char(pattern[0]), _is_word_char(pattern[-1])))
+
+    def _build(self) -> None:
+        """BFS 建立 fail 連結，並把 fail 節點的輸出併入"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def tag(self, text: str) -> List[str]:
+        """:return: 命中的標籤 (依在標題中出現的順序，不重複)"""
+        lowered = text.lower()
+        found: Dict[str, None] = {}
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for index in self._out[node]:
+                length, tag, check_start, check_end = self._patterns[index]
+                if tag in found:
+                    continue
+                start = i - length + 1
+                if check_start and start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if check_end and i + 1 < len(lowered) and _is_word_char(lowered[i + 1]):
+                    continue
+                found[tag] = None
+        return list(found)
+
+    def kind(self, tag: str) -> Optional[str]:
+        return self._kinds.get(tag)
+
+    @property
+    def signature(self) -> str:
+        """字典內容的雜湊；字典變更後資料庫據此重新標記"""
+        raw = json.dumps(self.dictionary, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
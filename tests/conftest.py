@@ -0,0 +1,5 @@
+"""測試共用設定：模組皆位於專案根目錄 (非套件)，以根目錄為 import 路徑"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+"""archive.Archive：月份分割、附加去重與索引快取"""
+import gzip
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from archive import Archive, DATA_SUFFIX
+
+OCT = datetime(2026, 10, 5, tzinfo=timezone.utc).timestamp()
+NOV = datetime(2026, 11, 5, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return Archive(str(tmp_path / "archive"))
+
+
+def _items(prefix: str, count: int, ts: int = 1_790_000_000) -> list:
+    return [{"title": f"{prefix} {i}", "link": f"https://{prefix}/{i}", "published_ts": ts + i} for i in range(count)]
+
+
+def test_append_skips_links_already_in_current_month(archive):
+    assert archive.append(_items("a", 3), now=OCT) == 3
+    assert archive.append(_items("a", 5), now=OCT) == 2
+    assert archive.append(_items("b", 2) * 2, now=OCT) == 2   # 同批重複
+    assert archive.count() == 7 and archive.stats("2026-10") == (7, 3)
+
+
+def test_append_only_reads_current_month_index(archive, monkeypatch):
+    archive.append(_items("a", 3), now=OCT)
+    fresh = Archive(archive.root)
+    read = []
+    original = fresh.blocks
+    monkeypatch.setattr(fresh, "blocks", lambda month: read.append(month) or original(month))
+    assert fresh.append(_items("a", 3), now=NOV) == 3     # 分割依寫入月份：新月份重新寫入
+    assert read == ["2026-11"]
+    assert archive.months() == ["2026-11", "2026-10"]
+
+
+def test_reload_after_another_writer_appends(archive):
+    other = Archive(archive.root)
+    archive.append(_items("a", 1), now=OCT)
+    other.append(_items("a", 2), now=OCT)
+    assert archive.append(_items("a", 2), now=OCT) == 0
+
+
+def test_read_filters_by_publish_time_and_file_stays_gzip(archive):
+    archive.append(_items("a", 5, ts=1000), now=OCT)
+    archive.append(_items("b", 5, ts=5000), now=OCT)
+    got = [r["link"] for r in archive.read("2026-10", since=1002, until=5002)]
+    assert got == ["https://b/1", "https://b/0", "https://a/4", "https://a/3", "https://a/2"]
+    with gzip.open(os.path.join(archive.root, "2026-10" + DATA_SUFFIX), "rt", encoding="utf-8") as f:
+        assert len(f.readlines()) == 10
+
+
+def test_stats_cached_until_index_changes(archive, monkeypatch):
+    archive.append(_items("a", 2), now=OCT)
+    calls = []
+    original = archive.blocks
+    monkeypatch.setattr(archive, "blocks", lambda month: calls.append(month) or original(month))
+    assert archive.stats("2026-10") == (2, 1)
+    assert archive.stats("2026-10") == (2, 1)
+    assert len(calls) == 1
+    archive.append(_items("b", 1), now=OCT)
+    assert archive.count() == 3
@@ -0,0 +1,45 @@
+"""dedupe：近似重複標題分群"""
+from dedupe import IncrementalClusterer, cluster_items, fingerprint, is_near_duplicate
+from news_entry import NewsEntry
+
+HEADLINE = "台積電宣布在美國亞利桑那州擴建先進製程晶圓廠"
+
+
+def _entry(title: str, source: str, link: str) -> NewsEntry:
+    return NewsEntry(title, link, 1_790_000_000, source, "測試")
+
+
+def test_fingerprint_strips_outlet_suffix():
+    assert fingerprint(f"{HEADLINE} - 經濟日報") == fingerprint(f"{HEADLINE} | 工商時報")
+    assert is_near_duplicate(fingerprint(HEADLINE), fingerprint(HEADLINE + "第二座"))
+    assert not is_near_duplicate(fingerprint(HEADLINE), fingerprint("印尼鎳礦出口禁令延長"))
+
+
+def test_cluster_items_keeps_first_as_representative():
+    items = [
+        _entry(f"{HEADLINE} - 經濟日報", "經濟日報", "https://a/1"),
+        _entry("印尼鎳礦出口禁令延長 - 中央社", "中央社", "https://c/1"),
+        _entry(f"{HEADLINE} - 工商時報", "工商時報", "https://b/1"),
+        _entry(f"{HEADLINE} - 工商時報", "工商時報", "https://b/2"),
+    ]
+    clusters = cluster_items(items)
+    assert [c.representative.link for c in clusters] == ["https://a/1", "https://c/1"]
+    assert [len(c.members) for c in clusters] == [3, 1]
+    assert items[0].covered_by == 2          # 不同媒體數，不是項目數
+    assert items[1].covered_by == 1
+
+
+def test_cluster_items_is_transitive():
+    a = _entry("Foxconn to build EV battery plant in Batam Indonesia", "A", "https://a")
+    b = _entry("Foxconn to build EV battery plant in Batam Indonesia soon", "B", "https://b")
+    c = _entry("Foxconn to build EV battery plant in Batam Indonesia soon report", "C", "https://c")
+    clusters = cluster_items([a, c, b])
+    assert len(clusters) == 1 and clusters[0].representative is a
+
+
+def test_incremental_clusterer_matches_streaming_order():
+    clusterer = IncrementalClusterer()
+    first = _entry(f"{HEADLINE} - 經濟日報", "經濟日報", "https://a/1")
+    assert clusterer.add(first)
+    assert not clusterer.add(_entry(f"{HEADLINE} - 工商時報", "工商時報", "https://b/1"))
+    assert clusterer.representatives == [first] and first.covered_by == 2
@@ -0,0 +1,182 @@
+"""fetcher.AsyncFetcher：對本機伺服器實際收發 (bench.feed_server 與逐位元組控制的小型伺服器)"""
+import concurrent.futures
+import gzip
+import socket
+import threading
+from typing import Callable, Optional, Tuple
+
+import pytest
+
+from bench.feed_server import FeedServer
+from feed_cache import FeedCache, HIT, MISS, REVALIDATED, STALE
+from fetcher import AsyncFetcher, FetchError, FetchTrace
+
+# handler(path, 同一連線上的第幾個請求) -> (原始回應, 回應後是否關閉連線)；回應為 None 時直接關閉
+Handler = Callable[[str, int], Tuple[Optional[bytes], bool]]
+
+
+class RawServer:
+    """每個連線依序讀取請求 (只讀到標頭結束)，回應內容由 handler 決定"""
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.connections = 0
+        self._sock = socket.create_server(("127.0.0.1", 0))
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._sock.getsockname()[1]}"
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        with conn, conn.makefile("rb") as f:
+            served = 0
+            while True:
+                line = f.readline()
+                if not line:
+                    return
+                while f.readline() not in (b"\r\n", b""):
+                    pass
+                reply, close = self.handler(line.split()[1].decode(), served)
+                served += 1
+                if reply is None:
+                    return
+                conn.sendall(reply)
+                if close:
+                    return
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+def _response(status: str, body: bytes = b"", headers: Tuple[str, ...] = ()) -> bytes:
+    lines = [f"HTTP/1.1 {status}", *headers]
+    if not any(h.lower().startswith("transfer-encoding") for h in headers):
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+@pytest.fixture
+def fetcher():
+    return AsyncFetcher(timeout=2.0, retries=0, backoff=0.01)
+
+
+@pytest.fixture
+def raw_server():
+    servers = []
+
+    def _start(handler: Handler) -> RawServer:
+        servers.append(RawServer(handler))
+        return servers[-1]
+
+    yield _start
+    for server in servers:
+        server.close()
+
+
+def test_chunked_gzip_body(fetcher, raw_server):
+    body = gzip.compress(b"<rss>chunked</rss>")
+    chunks = b"".join(f"{len(part):x}\r\n".encode() + part + b"\r\n" for part in (body[:7], body[7:]))
+    server = raw_server(lambda path, n: (_response(
+        "200 OK", chunks + b"0\r\nX-Trailer: 1\r\n\r\n",
+        ("Transfer-Encoding: chunked", "Content-Encoding: gzip")), False))
+
+    trace = FetchTrace()
+    resp = fetcher.submit(server.url + "/feed").result()
+    assert resp == (b"<rss>chunked</rss>", MISS)
+
+    # 同一連線繼續使用 (chunked 結尾與 trailer 已完整讀完)
+    fetcher.fetch(server.url + "/again", trace=trace)
+    assert trace.reused and server.connections == 1
+
+
+def test_follows_redirects(fetcher, raw_server):
+    def handler(path, n):
+        if path == "/old":
+            return _response("301 Moved Permanently", headers=("Location: /new",)), False
+        return _response("200 OK", b"moved here"), False
+
+    server = raw_server(handler)
+    assert fetcher.fetch(server.url + "/old") == (b"moved here", MISS)
+
+
+def test_stale_pooled_connection_is_replaced(fetcher, raw_server):
+    """池中連線已被對方關閉 (收到請求後無回應就斷線) 時，改開新連線重送一次"""
+    server = raw_server(lambda path, n: (_response("200 OK", b"ok") if n == 0 else None, False))
+
+    assert fetcher.fetch(server.url + "/a") == (b"ok", MISS)
+    trace = FetchTrace()
+    assert fetcher.fetch(server.url + "/b", trace=trace) == (b"ok", MISS)
+    assert server.connections == 2
+    assert not trace.reused and trace.attempts == 1
+
+
+def test_http_error_raises(fetcher, raw_server):
+    server = raw_server(lambda path, n: (_response("404 Not Found"), False))
+    with pytest.raises(FetchError) as excinfo:
+        fetcher.fetch(server.url + "/missing")
+    assert excinfo.value.status == 404
+
+
+def test_conditional_request_revalidates(fetcher, tmp_path):
+    cache = FeedCache(str(tmp_path), ttl=0)
+    with FeedServer(items=5) as server:
+        url = server.base_url + "?q=nickel"
+        body, status = fetcher.fetch(url, cache)
+        assert status == MISS and b"<rss" in body
+
+        assert fetcher.fetch(url, cache) == (body, REVALIDATED)
+        assert server.stats["not_modified"] == 1
+
+        cache.ttl = 600
+        assert fetcher.fetch(url, cache) == (body, HIT)
+        assert server.stats["requests"] == 2
+
+
+def test_network_error_falls_back_to_stale_cache(fetcher, tmp_path):
+    cache = FeedCache(str(tmp_path), ttl=0)
+    with FeedServer(items=5) as server:
+        url = server.base_url + "?q=stale"
+        body, _ = fetcher.fetch(url, cache)
+    # 伺服器已關閉 (新的 fetcher，不沿用池中連線)：連線失敗時沿用過期內容
+    assert AsyncFetcher(retries=0).fetch(url, cache) == (body, STALE)
+
+
+def test_slow_response_times_out(raw_server):
+    fetcher = AsyncFetcher(timeout=0.5, retries=0)
+    with FeedServer(items=5, latency=1.0) as server:
+        with pytest.raises(TimeoutError):
+            fetcher.fetch(server.base_url + "?q=slow")
+
+
+def test_queueing_for_host_slot_does_not_count_against_timeout():
+    """每個回應都在逾時內，排隊等 per-host 名額的時間不計入 (4 名額、8 個請求)"""
+    fetcher = AsyncFetcher(timeout=1.0, max_per_host=4, retries=0)
+    with FeedServer(items=5, latency=0.6) as server:
+        futures = [fetcher.submit(f"{server.base_url}?q={i}") for i in range(8)]
+        results = [f.result() for f in concurrent.futures.as_completed(futures, timeout=10)]
+    assert len(results) == 8
+    assert all(status == MISS for _, status in results)
+
+
+def test_http_proxy_gets_absolute_uri(raw_server):
+    seen = []
+    proxy = raw_server(lambda path, n: (seen.append(path) or _response("200 OK", b"via proxy"), False))
+    fetcher = AsyncFetcher(retries=0, proxies={"http": proxy.url.replace("http://", "http://u:p@")})
+    assert fetcher.fetch("http://news.example/rss?q=1") == (b"via proxy", MISS)
+    assert seen == ["http://news.example/rss?q=1"]
+
+
+def test_no_proxy_bypasses_proxy(raw_server):
+    origin = raw_server(lambda path, n: (_response("200 OK", b"direct"), False))
+    fetcher = AsyncFetcher(retries=0, proxies={"http": "http://127.0.0.1:9", "no": "127.0.0.1"})
+    assert fetcher.fetch(origin.url + "/rss") == (b"direct", MISS)
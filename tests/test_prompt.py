@@ -0,0 +1,70 @@
+"""prompt.PromptBuilder：token 預算取捨"""
+import time
+
+from news_entry import NewsEntry
+from prompt import (EMPTY_SECTION, FAILED_SECTION, PromptBuilder, estimate_tokens,
+                    format_section_header)
+
+NOW = int(time.time())
+
+
+def _items(prefix: str, count: int, age_hours: int, sources=("Reuters",)) -> list:
+    return [NewsEntry(f"{prefix} news item number {i}", f"https://{prefix}/{i}", NOW - (age_hours + i) * 3600,
+                      sources[i % len(sources)], prefix) for i in range(count)]
+
+
+def test_unlimited_budget_keeps_everything():
+    builder = PromptBuilder("HEAD\n", "FOOT", budget=None)
+    builder.add_section("A", _items("a", 5, 1))
+    builder.add_section("B", [])
+    builder.add_section("C", [], error="HTTP 503")
+    result = builder.build()
+    assert len(result.included) == 5 and not result.dropped
+    assert result.text.startswith("HEAD\n") and result.text.endswith("FOOT")
+    assert format_section_header("B") + EMPTY_SECTION in result.text
+    assert FAILED_SECTION.format(error="HTTP 503") in result.text
+
+
+def test_budget_is_respected_and_dropped_reported():
+    builder = PromptBuilder("HEAD\n", "FOOT", budget=400)
+    builder.add_section("A", _items("a", 40, 1))
+    result = builder.build()
+    assert result.tokens <= 400
+    assert result.dropped and len(result.included) + len(result.dropped) == 40
+    assert result.tokens == estimate_tokens(result.text)
+
+
+def test_older_section_is_not_squeezed_out():
+    """新近程度主導排序時，較舊的段落仍至少保留一則"""
+    builder = PromptBuilder("HEAD\n", "FOOT", budget=800)
+    builder.add_section("中文", _items("recent", 90, 1, sources=[f"zh{i}" for i in range(90)]))
+    builder.add_section("EN", _items("older", 90, 100, sources=[f"en{i}" for i in range(90)]))
+    result = builder.build()
+    assert result.tokens <= 800
+    assert {item.category for item in result.included} == {"recent", "older"}
+    assert format_section_header("中文") in result.text and format_section_header("EN") in result.text
+
+
+def test_fully_dropped_section_keeps_header_and_note():
+    builder = PromptBuilder("HEAD\n", "FOOT", budget=150)
+    builder.add_section("A", [NewsEntry("x" * 400, "https://a/1", NOW, "S", "a")])
+    result = builder.build()
+    assert not result.included
+    assert format_section_header("A") + "(因長度限制，本段 1 則新聞未列入)" in result.text
+
+
+def test_source_diversity_prefers_other_outlets():
+    same = [NewsEntry(f"Same outlet story {i}", f"https://s/{i}", NOW - i, "Same", "a") for i in range(5)]
+    other = NewsEntry("Other outlet story", "https://o/1", NOW - 3600, "Other", "a")
+    builder = PromptBuilder("", "", budget=None)
+    builder.add_section("A", same + [other])
+    order = [builder._sections[0][1][i].source for _, i in builder._ranked()]
+    assert order.index("Other") < 3
+
+
+def test_keywords_rank_matching_titles_first():
+    plain = NewsEntry("Markets open higher", "https://p/1", NOW, "A", "a")
+    hit = NewsEntry("Nickel smelter expands", "https://n/1", NOW - 86400, "B", "a")
+    builder = PromptBuilder("", "", budget=None, keywords=["nickel"])
+    builder.add_section("A", [plain, hit])
+    assert builder._ranked()[0] == (0, 1)
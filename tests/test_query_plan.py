@@ -0,0 +1,37 @@
+"""query_plan：多公司查詢分片"""
+import pytest
+
+from query_plan import (SPLIT_THRESHOLD, needs_split, or_query, plan_shards, shard_label,
+                        split_shard)
+
+
+@pytest.mark.parametrize("count, size, shape", [
+    (13, 4, [4, 3, 3, 3]),
+    (8, 4, [4, 4]),
+    (3, 4, [3]),
+    (5, 1, [1, 1, 1, 1, 1]),
+    (0, 4, []),
+])
+def test_plan_shards_even_sizes(count, size, shape):
+    terms = [f"t{i}" for i in range(count)]
+    shards = plan_shards(terms, size)
+    assert [len(s) for s in shards] == shape
+    assert [t for s in shards for t in s] == terms
+
+
+def test_split_shard():
+    assert split_shard(["a", "b", "c"]) == [["a", "b"], ["c"]]
+    assert split_shard(["a"]) == []
+
+
+def test_needs_split():
+    assert needs_split(["a", "b"], SPLIT_THRESHOLD)
+    assert not needs_split(["a", "b"], SPLIT_THRESHOLD - 1)
+    assert not needs_split(["a"], 100)
+    assert not needs_split(["a", "b"], 100, covered={"a", "b"})   # 每家都已命中
+    assert needs_split(["a", "b"], 100, covered={"a"})
+
+
+def test_or_query_and_label():
+    assert or_query(['"Hon Hai"', "鴻海"]) == "(%22Hon%20Hai%22%20OR%20%E9%B4%BB%E6%B5%B7)"
+    assert shard_label(['"Hon Hai"', "鴻海"]) == "Hon Hai|鴻海"
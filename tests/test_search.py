@@ -0,0 +1,58 @@
+"""search：切詞與 FTS5 查詢轉換"""
+import sqlite3
+
+import pytest
+
+from search import build_match_query, ensure_index, index_rows, to_document, tokenize
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert tokenize("印尼電動車 EV Battery") == ["印尼", "尼電", "電動", "動車", "ev", "battery"]
+    assert tokenize("ＡＢＣ１２３") == ["abc123"]      # 全形轉半形
+    assert tokenize("鎳") == ["鎳"]
+
+
+def test_document_appends_distinct_unigrams_after_bigrams():
+    assert to_document("印尼產鎳尼") == "印尼 尼產 產鎳 鎳尼 印 尼 產 鎳"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("印尼 電動車", '("印尼" AND "電動 動車")'),
+    ("印尼 OR nickel", '("印尼") OR ("nickel"*)'),
+    ('"nickel smelter" | 鎳', '("nickel smelter") OR ("鎳")'),
+    ("鎳", '("鎳")'),
+    ("", None),
+    ('"" OR ()*:', None),                     # 只剩 FTS 語法字元：無法注入，視為空查詢
+])
+def test_build_match_query(query, expected):
+    assert build_match_query(query) == expected
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+                       "CREATE TABLE news (id INTEGER PRIMARY KEY, title TEXT, source TEXT, category TEXT);")
+    ensure_index(conn)
+    rows = [(1, "印尼產鎳大增", "經濟日報", "印尼"), (2, "Nickel smelter in Indonesia", "Reuters", "EN")]
+    conn.executemany("INSERT INTO news VALUES (?, ?, ?, ?)", rows)
+    index_rows(conn, rows)
+    return conn
+
+
+def _match(conn, query):
+    sql = "SELECT rowid FROM news_fts WHERE news_fts MATCH ? ORDER BY rowid"
+    return [r[0] for r in conn.execute(sql, (build_match_query(query),))]
+
+
+@pytest.mark.parametrize("query, ids", [
+    ("鎳", [1]),          # 單字命中 bigram 結尾的位置
+    ("產鎳", [1]),
+    ('"印尼產鎳"', [1]),
+    ("尼產鎳大", [1]),
+    ("smelt", [2]),       # 英文前綴
+    ("印尼 OR indonesia", [1, 2]),
+    ("鎳 smelter", []),
+])
+def test_queries_against_fts(conn, query, ids):
+    assert _match(conn, query) == ids
@@ -0,0 +1,64 @@
+"""storage.NewsStore：近似重複別名與 covered_by、標籤"""
+import time
+
+import pytest
+
+from news_entry import NewsEntry
+from storage import NewsStore
+
+NOW = int(time.time())
+HEADLINE = "台積電宣布在美國亞利桑那州擴建先進製程晶圓廠"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NewsStore(str(tmp_path / "news.db"), legacy_json=None)
+
+
+def _entry(link: str, source: str, ts: int = NOW, title: str = HEADLINE, covered_by: int = 1) -> NewsEntry:
+    return NewsEntry(f"{title} - {source}", link, ts, source, "測試", covered_by=covered_by)
+
+
+def _covered(store: NewsStore) -> dict:
+    return {e.link: e.covered_by for e in store.recent(50)}
+
+
+def test_representative_flip_does_not_inflate_covered_by(store):
+    """兩家媒體的同一則新聞，每次掃描的代表不同，covered_by 仍為 2"""
+    a, b = _entry("https://a/1", "經濟日報"), _entry("https://b/1", "工商時報")
+    for _ in range(3):
+        for rep, member in ((a, b), (b, a)):
+            rep = rep.copy()
+            rep.covered_by = 2
+            store.save_items([rep], {rep.link: [member.copy()]})
+    assert _covered(store) == {"https://a/1": 2}
+
+
+def test_new_near_duplicate_counts_distinct_sources(store):
+    store.save_items([_entry("https://a/1", "經濟日報")])
+    store.save_items([_entry("https://b/1", "工商時報")])
+    store.save_items([_entry("https://b/2", "工商時報")])   # 同媒體的另一個連結不增加
+    store.save_items([_entry("https://b/1", "工商時報")])   # 已是別名：略過
+    assert _covered(store) == {"https://a/1": 2}
+
+
+def test_near_duplicate_only_within_window(store):
+    store.save_items([_entry("https://a/old", "經濟日報", ts=NOW - 40 * 86400)])
+    store.save_items([_entry("https://b/new", "工商時報")])
+    assert _covered(store) == {"https://a/old": 1, "https://b/new": 1}
+
+
+def test_dictionary_change_keeps_existing_tags(tmp_path):
+    """字典變更重新標記時，保留單一公司分片判定的公司標籤與別名併入的標籤"""
+    from tagger import Tagger
+
+    path = str(tmp_path / "news.db")
+    store = NewsStore(path, legacy_json=None, tagger=Tagger({"company": {"鴻海": ["Foxconn"]}}))
+    item = NewsEntry("Batam plant adds EV battery line", "https://a/1", NOW, "Reuters", "EN", tags=["鴻海"])
+    store.save_items([item])
+
+    tagger = Tagger({"company": {"鴻海": ["Foxconn"]}, "keyword": {"電池": ["battery"]}})
+    reopened = NewsStore(path, legacy_json=None, tagger=tagger)
+    assert reopened.recent(1)[0].tags == ["鴻海", "電池"]
+    assert reopened.tag_counts(kind="company") == [("鴻海", 1)]
+    assert reopened.search("", tags=["鴻海"])
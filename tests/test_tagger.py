@@ -0,0 +1,38 @@
+"""tagger.Tagger：多模式比對"""
+import pytest
+
+from tagger import Tagger
+
+
+@pytest.fixture
+def tagger():
+    return Tagger({
+        "company": {"鴻海": ['"Foxconn"', "富士康", '"Hon Hai"'], "光陽": ['"Kymco"']},
+        "keyword": {"電動車": ["EV", "電動機車"], "鎳礦": ["nickel", "鎳"]},
+    })
+
+
+@pytest.mark.parametrize("title, tags", [
+    ("Foxconn to build EV plant", ["鴻海", "電動車"]),
+    ("Seven new nickel smelters", ["鎳礦"]),          # EV 不命中 Seven (單字邊界)
+    ("EVs and e-bikes", []),                          # EVs 非完整單字
+    ("HON HAI earnings", ["鴻海"]),                   # 不分大小寫
+    ("印尼鎳礦出口與富士康投資", ["鎳礦", "鴻海"]),      # 中文不受單字邊界限制，依出現順序
+    ("光陽電動機車進軍印尼", ["光陽", "電動車"]),
+    ("Kymco EV, Foxconn EV", ["光陽", "電動車", "鴻海"]),  # 不重複
+    ("", []),
+])
+def test_tag(tagger, title, tags):
+    assert tagger.tag(title) == tags
+
+
+def test_kind_and_signature(tagger):
+    assert tagger.kind("鴻海") == "company" and tagger.kind("鎳礦") == "keyword" and tagger.kind("x") is None
+    assert tagger.signature == Tagger(dict(tagger.dictionary)).signature
+    assert tagger.signature != Tagger({"company": {"鴻海": []}}).signature
+
+
+def test_overlapping_patterns_use_failure_links():
+    tagger = Tagger({"keyword": {"A": ["甲乙丙丁"], "B": ["乙丙"], "C": ["乙丙戊"]}})
+    assert tagger.tag("子甲乙丙戊") == ["B", "C"]
+    assert tagger.tag("甲乙丙丁") == ["B", "A"]
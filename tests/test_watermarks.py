@@ -0,0 +1,98 @@
+"""高水位標記：_WatermarkTracker、_emitted_marks 與快照 / 共用結果的標記推進"""
+import pytest
+
+import logic
+from bench.feed_server import FeedServer
+from diagnostics import ScanDiagnostics
+from feed_cache import FeedCache
+from news_entry import NewsEntry
+from storage import NewsStore
+
+TS = 1_790_000_000
+
+
+def _entry(link: str, ts) -> NewsEntry:
+    return NewsEntry(link, link, ts, "測試", "測試")
+
+
+def test_tracker_excludes_seen_ids_at_mark():
+    tracker = logic._WatermarkTracker((TS, {"https://a"}), skip_seen=True)
+    assert not tracker.accept(TS - 1, "https://old")
+    assert not tracker.accept(TS, "https://a")        # 同一時間點、已看過
+    assert tracker.accept(TS, "https://b")            # 同一時間點的其他項目仍保留
+    assert tracker.accept(TS + 1, "https://a")
+    assert tracker.accept(None, "https://undated")
+
+
+def test_tracker_accepts_everything_without_delta_or_mark():
+    assert logic._WatermarkTracker((TS, {"https://a"}), skip_seen=False).accept(TS - 1, "https://a")
+    assert logic._WatermarkTracker((None, set()), skip_seen=True).accept(0, "https://a")
+
+
+def test_emitted_marks_hold_at_oldest_dropped_item():
+    a = [_entry("a1", TS + 30), _entry("a2", TS + 20), _entry("a3", TS + 10), _entry("a4", TS + 10)]
+    b = [_entry("b1", TS + 5), _entry("b2", None)]
+    c = [_entry("c1", TS)]
+    shown = {"a1", "a3", "a4", "b1"}                   # a2 被預算省略，c 完全未輸出
+    shard_items = [({"url": "A"}, a), ({"url": "B"}, b), ({"url": "C"}, c)]
+    keys = {"A": "ka", "B": "kb", "C": "kc"}
+    marks = logic._emitted_marks(shard_items, keys, lambda item: item.link in shown)
+    assert marks == {"ka": (TS + 20, []), "kb": (TS + 5, ["b1"])}
+
+    shown.add("a2")
+    marks = logic._emitted_marks(shard_items, keys, lambda item: item.link in shown)
+    assert marks["ka"] == (TS + 30, ["a1"])
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """logic 指向本機模擬伺服器與暫存的 cache / DB"""
+    with FeedServer(items=20) as server:
+        monkeypatch.setattr(logic, "GOOGLE_NEWS_RSS", server.base_url)
+        monkeypatch.setattr(logic, "FEED_CACHE", FeedCache(str(tmp_path / "cache")))
+        monkeypatch.setattr(logic, "NEWS_STORE", NewsStore(str(tmp_path / "news.db"), legacy_json=None))
+        logic.RESULT_CACHE.invalidate()
+        yield server
+        logic.RESULT_CACHE.invalidate()
+
+
+def _run(mode="macro", keyword=None, **kwargs):
+    diagnostics = ScanDiagnostics()
+    prompt, items = logic.generate_chatgpt_prompt("3天", 3, mode, keyword, diagnostics=diagnostics, **kwargs)
+    return prompt, items, diagnostics
+
+
+def _delta(scope, mode="macro", keyword=None):
+    return _run(mode, keyword, watermark_scope=scope, delta=True)[1]
+
+
+def test_snapshot_reader_advances_own_marks(env):
+    _, items, _ = _run()                               # 背景 worker 產生快照 (不記錄個人標記)
+    assert items
+    snapshot_marks = logic.NEWS_STORE.get_watermarks(logic._snapshot_scope("macro", 3))
+    assert snapshot_marks and logic.NEWS_STORE.get_watermarks("u1") == {}
+    logic.RESULT_CACHE.invalidate()
+
+    _, snapshot_items, diagnostics = _run(watermark_scope="u1")
+    assert diagnostics.from_snapshot and len(snapshot_items) == len(items)
+    assert logic.NEWS_STORE.get_watermarks("u1") == snapshot_marks
+    assert _delta("u1") == []
+    assert _delta("u2")                                # 未讀過快照的使用者不受影響
+
+
+def test_shared_result_advances_each_scope(env):
+    _, items, first = _run("custom", "Nickel", watermark_scope="u1")
+    assert items and first.shared == ""
+    _, shared_items, second = _run("custom", "Nickel", watermark_scope="u2")
+    assert second.shared == "hit" and len(shared_items) == len(items)
+    assert logic.NEWS_STORE.get_watermarks("u2") == logic.NEWS_STORE.get_watermarks("u1") != {}
+    assert _delta("u1", "custom", "Nickel") == []
+    assert _delta("u2", "custom", "Nickel") == []
+
+
+def test_items_dropped_by_budget_reappear_in_next_delta(env):
+    prompt, items, _ = _run("custom", "Nickel", token_budget=300, watermark_scope="u1")
+    dropped = {item.link for item in items if item.title not in prompt}
+    assert dropped
+    again = {item.link for item in _delta("u1", "custom", "Nickel")}
+    assert dropped <= again
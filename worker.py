@@ -0,0 +1,163 @@
+"""
+背景預抓 worker
+
+定期為每個預設主題 (macro / industry / vip) × 每個時間範圍 (DATE_MAP) 執行掃描，
+結果寫入 news.db 的 snapshots 表，UI 點選主題時直接讀取快照，不需等待即時抓取。
+同一時間只允許一個 worker 執行 (lock file)。
+
+用法:
+    python worker.py                          # 每 15 分鐘更新一次
+    python worker.py --once                   # 只執行一輪 (適合 cron)
+    python worker.py --interval 600 --modes macro,vip --windows 3天,1週
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import logic
+from diagnostics import ScanDiagnostics
+
+# ================= 1. Constants =================
+
+DEFAULT_INTERVAL: int = 15 * 60
+DEFAULT_LOCK_PATH: str = os.path.join(".cache", "prefetch.lock")
+LOCK_STALE_AFTER: int = 2 * 60 * 60   # lock 超過此秒數且程序已不存在時視為殘留
+
+# ================= 2. Lock File =================
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+class LockFile:
+    """以 O_EXCL 建立 lock file，記錄 pid；程序已結束的殘留 lock 會被清除"""
+
+    def __init__(self, path: str = DEFAULT_LOCK_PATH):
+        self.path = path
+        self._held = False
+
+    def acquire(self) -> bool:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._clear_stale():
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            self._held = True
+            return True
+        return False
+
+    def _clear_stale(self) -> bool:
+        try:
+            with open(self.path, "r") as f:
+                pid = int(f.read().strip() or 0)
+            age = time.time() - os.path.getmtime(self.path)
+        except (OSError, ValueError):
+            pid, age = 0, LOCK_STALE_AFTER
+        if pid and _pid_alive(pid) and age < LOCK_STALE_AFTER:
+            return False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return True
+
+    def touch(self) -> None:
+        """長時間執行時更新 mtime，避免被判為殘留"""
+        if self._held:
+            os.utime(self.path)
+
+    def release(self) -> None:
+        if self._held:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self._held = False
+
+    def __enter__(self) -> "LockFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+# ================= 3. Worker =================
+
+def _log(message: str) -> None:
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+def refresh_all(modes: List[str], windows: List[Tuple[str, int]], lock: Optional[LockFile] = None) -> int:
+    """執行一輪預抓，回傳失敗數"""
+    failures = 0
+    for mode in modes:
+        for label, days in windows:
+            started = time.time()
+            diagnostics = ScanDiagnostics()
+            try:
+                _, items = logic.run_scan(label, days, mode, diagnostics=diagnostics)
+                _log(f"{mode} / {label}: {len(items)} 則 ({time.time() - started:.1f}s)")
+                for report in diagnostics.failures:
+                    _log(f"  來源失敗 {report.name}: {report.error}")
+                if diagnostics.failures:
+                    _log("  有來源失敗，本輪不更新快照")
+            except Exception as e:
+                failures += 1
+                _log(f"{mode} / {label} 失敗: {e}")
+            if lock:
+                lock.touch()
+    return failures
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="定期預抓所有主題，寫入快照供 UI 直接讀取")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="每輪間隔秒數")
+    parser.add_argument("--once", action="store_true", help="只執行一輪後結束")
+    parser.add_argument("--modes", default=",".join(logic.TOPIC_MAP.values()),
+                        help="逗號分隔的主題 (macro,industry,vip)")
+    parser.add_argument("--windows", default=",".join(logic.DATE_MAP.keys()),
+                        help="逗號分隔的時間範圍 (DATE_MAP 的鍵，例如 3天,1週)")
+    parser.add_argument("--lock", default=DEFAULT_LOCK_PATH, help="lock file 路徑")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in logic.TOPIC_MAP.values()]
+    if unknown:
+        print(f"未知的主題: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    try:
+        windows = [(label, logic.DATE_MAP[label]) for label in args.windows.split(",") if label]
+    except KeyError as e:
+        print(f"未知的時間範圍: {e}", file=sys.stderr)
+        return 2
+
+    with LockFile(args.lock) as lock:
+        if not lock.acquire():
+            print(f"已有 worker 執行中 ({args.lock})", file=sys.stderr)
+            return 1
+
+        try:
+            while True:
+                started = time.time()
+                failures = refresh_all(modes, windows, lock)
+                _log(f"本輪完成，耗時 {time.time() - started:.1f}s，失敗 {failures} 項")
+                if args.once:
+                    return 1 if failures else 0
+                time.sleep(max(0.0, args.interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            return 0
+
+if __name__ == "__main__":
+    sys.exit(main())